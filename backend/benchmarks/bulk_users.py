@@ -0,0 +1,106 @@
+"""
+Bulk user operations end to end
+
+Registers users through the client API (so HWIDs are stored the way login
+and registration store them), then bans, unbans and deletes them by HWID
+through the admin bulk endpoints and checks each step. Also bans a sparse
+id selection spread over a wide id space and checks that the number of
+statements follows the number of matching users, not the width of the range.
+
+Usage:
+    python -m benchmarks.bulk_users
+    python -m benchmarks.bulk_users --users 20000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# Always run against a throwaway database; this module seeds data
+_scratch = tempfile.NamedTemporaryFile(prefix="skyline_bulk_", suffix=".db", delete=False)
+os.environ["DATABASE_URL"] = f"sqlite:///{_scratch.name}"
+
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+
+from database import SessionLocal, engine
+from main import app
+from models import Admin, App, User
+from security.hwid import hash_hwid
+from security.jwt import create_access_token
+from utils.query_counter import QueryCounter
+
+HWID = "BULK-TEST-HWID"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=5000, help="extra users seeded for the timing run")
+    args = parser.parse_args()
+
+    checks = {}
+    with TestClient(app) as client:
+        db = SessionLocal()
+        admin = Admin(username="bulk_admin", password_hash="x", is_active=True)
+        db.add(admin)
+        db.flush()
+        application = App(name="Bulk", secret="bulk-secret", admin_id=admin.id)
+        db.add(application)
+        db.commit()
+        app_id = application.id
+        headers = {"Authorization": f"Bearer {create_access_token({'admin_id': admin.id, 'type': 'admin'})[0]}"}
+
+        for name, hwid in (("hw_one", HWID), ("hw_two", HWID), ("hw_other", "OTHER-HWID")):
+            client.post("/api/register", json={
+                "username": name, "password": "pw", "hwid": hwid, "app_secret": "bulk-secret"
+            })
+
+        def bulk(action: str, **body):
+            return client.post(f"/api/admin/users/bulk/{action}", headers=headers, json=body).json()
+
+        checks["dry run by HWID matches registered users"] = bulk("ban", hwid=HWID, dry_run=True).get("matched") == 2
+        checks["ban by HWID bans them"] = bulk("ban", hwid=HWID, reason="test").get("affected") == 2
+        login = client.post("/api/login", json={
+            "username": "hw_one", "password": "pw", "hwid": HWID, "app_secret": "bulk-secret"
+        })
+        checks["banned user cannot log in"] = login.status_code >= 400
+        checks["other HWID untouched"] = not db.query(User.is_banned).filter(User.username == "hw_other").scalar()
+        checks["unban by HWID restores them"] = bulk("unban", hwid=HWID).get("affected") == 2
+
+        # Two users 9 million ids apart
+        db.execute(insert(User), [
+            {"id": 9_000_000, "username": "sparse_high", "password_hash": "x", "app_id": app_id},
+        ])
+        db.commit()
+        low = db.query(User.id).filter(User.username == "hw_other").scalar()
+        with QueryCounter(engine) as counter:
+            result = bulk("ban", user_ids=[low, 9_000_000])
+        checks["sparse selection banned"] = result.get("affected") == 2
+        checks[f"sparse selection ran few statements ({counter.count})"] = counter.count < 20
+
+        checks["delete by HWID removes them"] = bulk("delete", hwid=HWID).get("affected") == 2
+        db.expire_all()
+        checks["deleted users are gone"] = db.query(User).filter(User.username.in_(["hw_one", "hw_two"])).count() == 0
+
+        db.execute(insert(User), [
+            {"username": f"bulk_{i}", "password_hash": "x", "hwid": hash_hwid("SEEDED-HWID"), "app_id": app_id}
+            for i in range(args.users)
+        ])
+        db.commit()
+        db.close()
+        started = time.perf_counter()
+        result = bulk("ban", hwid="SEEDED-HWID")
+        elapsed = time.perf_counter() - started
+        print(f"banned {result.get('affected'):,} users by HWID in {elapsed * 1000:.0f}ms")
+        checks["every seeded user banned"] = result.get("affected") == args.users
+
+    for name, ok in checks.items():
+        print(f"{'ok  ' if ok else 'FAIL'} {name}")
+    engine.dispose()
+    os.unlink(_scratch.name)
+    sys.exit(0 if all(checks.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Cold-start (import + startup) time budget
+
+Boots the app in fresh interpreters against a scratch SQLite database: once to
+create the schema, then --runs more times on the fast-boot path. Each run times
+`import main` and the lifespan startup. The median of the fast boots must stay
+under --budget-ms or the script exits 1, so CI catches import-time regressions.
+
+Usage:
+    python -m benchmarks.cold_start
+    python -m benchmarks.cold_start --runs 5 --budget-ms 2000 --top 15
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+CHILD = """
+import json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(main.app):
+    ready = time.perf_counter()
+print(json.dumps({"import_ms": (imported - started) * 1000, "startup_ms": (ready - imported) * 1000}))
+"""
+
+
+def boot(database_url: str, importtime: bool = False):
+    env = dict(os.environ, DATABASE_URL=database_url)
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", CHILD]
+    result = subprocess.run(command, cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        sys.stderr.write(result.stderr)
+        raise SystemExit(f"Boot failed with exit code {result.returncode}")
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    return timings, result.stderr
+
+
+def slowest_modules(importtime_output: str, top: int):
+    """First-party modules with the largest cumulative import time"""
+    first_party = {p.name for p in BACKEND_DIR.iterdir() if p.is_dir()} | {
+        p.stem for p in BACKEND_DIR.glob("*.py")
+    }
+    rows = []
+    for line in importtime_output.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = [part.strip() for part in line[len("import time:"):].split("|")]
+        if not parts[1].isdigit():
+            continue
+        name = parts[2]
+        if name.split(".")[0] in first_party:
+            rows.append((int(parts[1]) / 1000, name))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("COLD_START_BUDGET_MS", "2500")))
+    parser.add_argument("--top", type=int, default=10, help="list the slowest first-party imports")
+    args = parser.parse_args()
+
+    scratch = tempfile.NamedTemporaryFile(prefix="skyline_boot_", suffix=".db", delete=False).name
+    database_url = f"sqlite:///{scratch}"
+    try:
+        first, _ = boot(database_url)
+        print(f"schema boot: import {first['import_ms']:.0f}ms, startup {first['startup_ms']:.0f}ms")
+
+        runs = [boot(database_url)[0] for _ in range(args.runs)]
+        import_ms = statistics.median(r["import_ms"] for r in runs)
+        startup_ms = statistics.median(r["startup_ms"] for r in runs)
+        total_ms = statistics.median(r["import_ms"] + r["startup_ms"] for r in runs)
+        print(f"fast boot (median of {args.runs}): import {import_ms:.0f}ms, startup {startup_ms:.0f}ms, "
+              f"total {total_ms:.0f}ms, budget {args.budget_ms:.0f}ms")
+
+        if args.top:
+            _, importtime_output = boot(database_url, importtime=True)
+            print("slowest first-party imports (cumulative):")
+            for ms, name in slowest_modules(importtime_output, args.top):
+                print(f"  {ms:8.1f}ms  {name}")
+    finally:
+        os.unlink(scratch)
+
+    if total_ms > args.budget_ms:
+        print(f"FAIL cold start {total_ms:.0f}ms is over the {args.budget_ms:.0f}ms budget")
+        sys.exit(1)
+    print("ok")
+
+
+if __name__ == "__main__":
+    main()
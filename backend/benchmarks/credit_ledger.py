@@ -0,0 +1,108 @@
+"""
+Credit ledger concurrency stress test
+
+Fires hundreds of parallel purchases at one reseller, each in its own session
+and thread, and checks that the balance never goes negative and that the
+ledger sums exactly to the change in balance.
+
+Usage:
+    python -m benchmarks.credit_ledger --purchases 500 --workers 50 --credits 200
+    python -m benchmarks.credit_ledger --database-url postgresql://...
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--purchases", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=50)
+    parser.add_argument("--credits", type=int, default=200, help="starting balance")
+    parser.add_argument("--cost", type=int, default=1, help="credits per purchase")
+    parser.add_argument("--database-url", default="", help="defaults to a scratch SQLite file")
+    args = parser.parse_args()
+
+    scratch = None
+    if not args.database_url:
+        scratch = tempfile.NamedTemporaryFile(prefix="skyline_ledger_", suffix=".db", delete=False).name
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{scratch}"
+
+    # Import after DATABASE_URL is set so the engine points at the test database
+    from sqlalchemy import func
+    from database import Base, SessionLocal, engine
+    from models import Admin, Reseller, CreditTransaction
+    from controllers.reseller_controller import apply_credit_change
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    admin = Admin(username=f"ledger_admin_{time.time_ns()}", password_hash="x", is_active=True)
+    db.add(admin)
+    db.flush()
+    reseller = Reseller(
+        username=f"ledger_reseller_{time.time_ns()}", email=f"ledger{time.time_ns()}@example.com",
+        password_hash="x", credits=Decimal(args.credits), admin_id=admin.id
+    )
+    db.add(reseller)
+    db.commit()
+    reseller_id = reseller.id
+    db.close()
+
+    cost = Decimal(args.cost)
+
+    def purchase(i: int) -> bool:
+        session = SessionLocal()
+        try:
+            apply_credit_change(session, reseller_id, -cost, "usage", f"stress purchase {i}")
+            session.commit()
+            return True
+        except ValueError:
+            return False
+        finally:
+            session.close()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        results = list(pool.map(purchase, range(args.purchases)))
+    elapsed = time.perf_counter() - started
+
+    db = SessionLocal()
+    balance = db.query(Reseller.credits).filter(Reseller.id == reseller_id).scalar()
+    ledger_sum, ledger_rows = db.query(
+        func.coalesce(func.sum(CreditTransaction.amount), 0), func.count(CreditTransaction.id)
+    ).filter(CreditTransaction.reseller_id == reseller_id).one()
+    balances_after = [
+        row[0] for row in db.query(CreditTransaction.balance_after)
+        .filter(CreditTransaction.reseller_id == reseller_id)
+    ]
+    db.close()
+
+    succeeded = sum(results)
+    expected = min(args.purchases, args.credits // args.cost)
+    checks = {
+        "balance never negative": balance >= 0,
+        "ledger sums to balance change": Decimal(args.credits) + Decimal(ledger_sum) == balance,
+        "one ledger row per purchase": ledger_rows == succeeded,
+        "every credit sold": succeeded == expected,
+        "balance_after values are unique": len(set(balances_after)) == len(balances_after),
+    }
+
+    print(f"purchases={args.purchases} workers={args.workers} credits={args.credits} cost={args.cost}")
+    print(f"{succeeded} succeeded, {args.purchases - succeeded} refused in {elapsed:.3f}s "
+          f"({args.purchases / elapsed:,.0f} purchases/s)")
+    print(f"final balance {balance}, ledger sum {ledger_sum} over {ledger_rows} rows")
+    for name, ok in checks.items():
+        print(f"{'ok  ' if ok else 'FAIL'} {name}")
+
+    if scratch:
+        engine.dispose()
+        os.unlink(scratch)
+    sys.exit(0 if all(checks.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+Client API load test
+
+Drives the client API scenarios against data created by benchmarks.seed,
+either in-process through httpx's ASGI transport (default) or against a live
+server with --base-url. Reports p50/p95/p99 latency and requests per second per
+scenario. With --baseline, results are compared against a JSON baseline and the
+run exits 1 when p95 grows or throughput drops by more than --tolerance.
+
+Usage:
+    python -m benchmarks.seed --scale 10k --database-url sqlite:////tmp/bench.db
+    python -m benchmarks.load --database-url sqlite:////tmp/bench.db --save-baseline benchmarks/baseline.json
+    python -m benchmarks.load --database-url sqlite:////tmp/bench.db --baseline benchmarks/baseline.json
+    python -m benchmarks.load --base-url http://localhost:8000 --scenarios init,vars,files
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+import httpx
+
+from benchmarks.seed import (
+    BENCH_PASSWORD, BENCH_SECRET, BENCH_VERSION, SCALES, license_key_for, username_for
+)
+
+SCENARIOS = ["init", "login", "license", "validate", "vars", "files", "bootstrap"]
+
+
+class Scenarios:
+    """Builds one request per call for every scenario; credentials are picked across the seeded population"""
+
+    def __init__(self, population: int, tokens: list):
+        self.population = population
+        self.tokens = tokens
+        self.rng = random.Random(7)
+
+    def pick(self) -> int:
+        return self.rng.randrange(self.population)
+
+    def init(self):
+        return "POST", "/api/init", {"json": {"app_secret": BENCH_SECRET, "version": BENCH_VERSION}}
+
+    def login(self):
+        return "POST", "/api/login", {"json": {
+            "app_secret": BENCH_SECRET, "username": username_for(self.pick()), "password": BENCH_PASSWORD
+        }}
+
+    def license(self):
+        return "POST", "/api/license", {"json": {"app_secret": BENCH_SECRET, "license_key": license_key_for(self.pick())}}
+
+    def validate(self):
+        token = self.tokens[self.rng.randrange(len(self.tokens))]
+        return "GET", "/api/validate", {"headers": {"Authorization": f"Bearer {token}"}}
+
+    def vars(self):
+        return "GET", "/api/vars", {"params": {"app_secret": BENCH_SECRET}}
+
+    def files(self):
+        return "GET", "/api/files", {"params": {"app_secret": BENCH_SECRET}}
+
+    def bootstrap(self):
+        return "POST", "/api/bootstrap", {"json": {
+            "app_secret": BENCH_SECRET, "version": BENCH_VERSION, "license_key": license_key_for(self.pick())
+        }}
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def run_scenario(client: httpx.AsyncClient, build, requests: int, concurrency: int) -> dict:
+    latencies = []
+    errors = {}
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            method, url, kwargs = build()
+            started = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 400:
+                errors[response.status_code] = errors.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "mean_ms": round(statistics.fmean(latencies), 2) if latencies else 0.0,
+    }
+
+
+async def collect_tokens(client: httpx.AsyncClient, scenarios: Scenarios, count: int) -> list:
+    tokens = []
+    for _ in range(count):
+        response = await client.post("/api/login", json=scenarios.login()[2]["json"])
+        if response.status_code == 200:
+            tokens.append(response.json()["token"])
+    if not tokens:
+        raise SystemExit("Could not log in any benchmark user; was the database seeded with benchmarks.seed?")
+    return tokens
+
+
+async def run(args) -> dict:
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=60)
+        lifespan = None
+    else:
+        import main  # Imported here so DATABASE_URL/RATE_LIMIT_PER_MINUTE are already set
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench", timeout=60)
+        lifespan = main.app.router.lifespan_context(main.app)
+        await lifespan.__aenter__()
+
+    results = {}
+    try:
+        scenarios = Scenarios(args.population, [])
+        if "validate" in args.scenarios:
+            scenarios.tokens = await collect_tokens(client, scenarios, args.tokens)
+        for name in args.scenarios:
+            build = getattr(scenarios, name)
+            await run_scenario(client, build, min(args.warmup, args.requests), args.concurrency)
+            results[name] = await run_scenario(client, build, args.requests, args.concurrency)
+            print_row(name, results[name])
+    finally:
+        await client.aclose()
+        if lifespan:
+            await lifespan.__aexit__(None, None, None)
+    return results
+
+
+def print_row(name: str, result: dict):
+    errors = sum(result["errors"].values())
+    print(f"{name:<10} {result['requests']:>7} {result['rps']:>9.1f} {result['p50_ms']:>9.2f} "
+          f"{result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} {errors:>7}")
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            continue
+        if result["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {result['p95_ms']}ms vs baseline {base['p95_ms']}ms")
+        if result["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: {result['rps']} req/s vs baseline {base['rps']} req/s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"comma separated: {','.join(SCENARIOS)}")
+    parser.add_argument("--requests", type=int, default=500, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=50)
+    # Keep below the engine's pool size + overflow (15): handlers run their sync queries on the event
+    # loop, so one more concurrent request blocks the loop waiting for a connection
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--scale", choices=SCALES, default="10k", help="scale the database was seeded with")
+    parser.add_argument("--tokens", type=int, default=20, help="user tokens collected for the validate scenario")
+    parser.add_argument("--base-url", default="", help="benchmark a live server instead of running in-process")
+    parser.add_argument("--database-url", default="", help="in-process only; defaults to DATABASE_URL")
+    parser.add_argument("--output", default="", help="write the results as JSON")
+    parser.add_argument("--baseline", default="", help="JSON baseline to compare against")
+    parser.add_argument("--save-baseline", default="", help="write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression")
+    args = parser.parse_args()
+
+    args.scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    args.population = SCALES[args.scale]
+    if not args.base_url:
+        if args.database_url:
+            os.environ["DATABASE_URL"] = args.database_url
+        # One in-process client shares one IP; lift the per-IP limit for the run
+        os.environ.setdefault("RATE_LIMIT_PER_MINUTE", "100000000")
+
+    target = args.base_url or "in-process"
+    print(f"target={target} requests={args.requests} concurrency={args.concurrency} scale={args.scale}")
+    print(f"{'scenario':<10} {'requests':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    results = asyncio.run(run(args))
+
+    report = {
+        "target": target,
+        "scale": args.scale,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "scenarios": results,
+    }
+    for path in filter(None, [args.output, args.save_baseline]):
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"wrote {path}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Presence table at scale
+
+Fills a PresenceTable with --sessions sessions spread over --apps apps, then
+reports heartbeat throughput, memory per session, how many objects the
+garbage collector has to track, count/page latency, and the cost of
+expiring every session through the timer wheel.
+
+Then replays heartbeats against a sweeper that runs a little late every
+time, on a simulated clock, and checks that no session is dropped while
+still fresh and that every session is gone once it expires (exit code 1
+otherwise).
+
+Usage:
+    python -m benchmarks.presence
+    python -m benchmarks.presence --sessions 500000 --apps 20
+"""
+import argparse
+import asyncio
+import gc
+import random
+import sys
+import time
+import tracemalloc
+
+from utils.presence import PresenceTable
+
+
+def lagging_sweeper_check(sessions: int = 2000, drift: float = 0.02) -> dict:
+    """Simulated clock: clients beat every 30s, then stop; the sweeper wakes `drift` late each slot"""
+    table = PresenceTable(ttl=90, slot=5)
+    start = 1_000_000.0
+    table.next_tick = int(start // table.slot)
+    rng = random.Random(7)
+    events = []
+    for user_id in range(1, sessions + 1):
+        beat = start + rng.uniform(0, 30)
+        stop = start + rng.uniform(0, 200)
+        while beat <= stop:
+            events.append((beat, user_id))
+            beat += 30
+    # The exact case from the report: sweep just before a slot boundary, heartbeat, sweep 10ms after it
+    events.append((start + 10.0, sessions + 1))
+    sweeps, now = [start + 4.99], start + 10.01
+    while now < start + 400:
+        sweeps.append(now)
+        now += table.slot + drift
+    events += [(moment, None) for moment in sweeps]
+    events.sort(key=lambda event: (event[0], event[1] is None))
+
+    last_seen = {}
+    dropped_early = 0
+    for moment, user_id in events:
+        if user_id is not None:
+            table.heartbeat(1, user_id, now=moment)
+            last_seen[user_id] = moment
+            continue
+        asyncio.run(table.sweep(moment))
+        online = set(table.apps[1].index) if 1 in table.apps else set()
+        dropped_early += sum(1 for uid, seen in last_seen.items() if seen + table.ttl > moment and uid not in online)
+    return {
+        "no fresh session dropped": dropped_early == 0,
+        "every session expired": table.count(1) == 0 and table.sessions == 0,
+        "wheel drained": table.stats()["wheel_entries"] == 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=500_000)
+    parser.add_argument("--apps", type=int, default=20)
+    args = parser.parse_args()
+
+    table = PresenceTable(ttl=90, slot=5)
+    gc.collect()
+    tracked_before = len(gc.get_objects())
+    tracemalloc.start()
+
+    started = time.perf_counter()
+    for i in range(args.sessions):
+        table.heartbeat(i % args.apps + 1, i + 1)
+    elapsed = time.perf_counter() - started
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    gc.collect()
+    tracked = len(gc.get_objects()) - tracked_before
+    print(f"{args.sessions:,} new sessions: {args.sessions / elapsed:,.0f} heartbeats/s, "
+          f"{memory / args.sessions:.0f} bytes/session, {tracked} new GC-tracked objects")
+
+    started = time.perf_counter()
+    for i in range(args.sessions):
+        table.heartbeat(i % args.apps + 1, i + 1)
+    elapsed = time.perf_counter() - started
+    print(f"repeat heartbeats: {args.sessions / elapsed:,.0f}/s")
+
+    started = time.perf_counter()
+    for _ in range(10_000):
+        table.count(1)
+        table.page(1, 5000, 100)
+    print(f"count + 100-row page: {(time.perf_counter() - started) / 10_000 * 1e6:.1f}us")
+
+    started = time.perf_counter()
+    gc.collect()
+    print(f"full gc.collect(): {(time.perf_counter() - started) * 1000:.1f}ms")
+
+    started = time.perf_counter()
+    removed = asyncio.run(table.sweep(time.monotonic() + table.ttl + 2 * table.slot))
+    print(f"expired {removed:,} sessions in {(time.perf_counter() - started) * 1000:.0f}ms; "
+          f"left {table.stats()['sessions']}")
+
+    checks = lagging_sweeper_check()
+    for name, ok in checks.items():
+        print(f"{'ok  ' if ok else 'FAIL'} lagging sweeper: {name}")
+    sys.exit(0 if all(checks.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Per-endpoint SQL query budgets
+
+Seeds a scratch SQLite database, calls each endpoint in BUDGETS through the
+ASGI app and fails (exit code 1) when one of them runs more statements than
+its budget. Budgets do not grow with the number of rows, so an N+1 loop shows
+up as a failure here before it shows up in production.
+
+Usage:
+    python -m benchmarks.query_budgets
+    python -m benchmarks.query_budgets --verbose
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+# Always run against a throwaway database; this module seeds data
+_scratch = tempfile.NamedTemporaryFile(prefix="skyline_budgets_", suffix=".db", delete=False)
+os.environ["DATABASE_URL"] = f"sqlite:///{_scratch.name}"
+
+from decimal import Decimal
+from fastapi.testclient import TestClient
+
+from database import SessionLocal, engine
+from main import app
+from models import (
+    Admin, App, License, Reseller, ResellerApplication, Ticket, TicketMessage, TicketAttachment
+)
+from security.jwt import create_access_token
+from utils.license_generator import generate_license_key
+from utils.query_counter import QueryBudgetExceeded, assert_max_queries
+
+# (role, method, path, budget) - paths may use {ticket_id}. Budgets are for the
+# hot path: authentication is served from the principal cache (warmed first)
+BUDGETS = [
+    ("reseller", "GET", "/api/reseller/profile", 1),
+    ("reseller", "GET", "/api/reseller/apps", 1),
+    ("reseller", "GET", "/api/reseller/licenses", 1),
+    ("reseller", "GET", "/api/reseller/credits/transactions", 1),
+    ("reseller", "GET", "/api/reseller/tickets", 1),
+    ("reseller", "GET", "/api/reseller/tickets/{ticket_id}", 6),
+    ("reseller", "GET", "/api/reseller/tickets/{ticket_id}/messages", 5),
+    ("admin", "GET", "/api/admin/stats", 5),
+    ("admin", "GET", "/api/admin/tickets/", 1),
+    ("admin", "GET", "/api/admin/tickets/{ticket_id}", 6),
+    ("admin", "GET", "/api/admin/resellers/", 1),
+    ("admin", "GET", "/api/admin/licenses/", 1),
+    ("admin", "GET", "/api/admin/users/", 1),
+]
+
+
+def seed(apps: int = 5, licenses: int = 50, tickets: int = 3, messages: int = 10):
+    db = SessionLocal()
+    admin = Admin(username="budget_admin", password_hash="x", is_active=True)
+    db.add(admin)
+    db.flush()
+    reseller = Reseller(
+        username="budget_reseller", email="budget@example.com", password_hash="x",
+        credits=Decimal("1000"), admin_id=admin.id
+    )
+    db.add(reseller)
+    db.flush()
+    app_rows = [App(name=f"App {i}", secret=f"budget-secret-{i}", admin_id=admin.id) for i in range(apps)]
+    db.add_all(app_rows)
+    db.flush()
+    db.add_all([ResellerApplication(reseller_id=reseller.id, app_id=a.id) for a in app_rows])
+    db.add_all([
+        License(
+            key=generate_license_key(), app_id=app_rows[i % apps].id,
+            created_by_reseller_id=reseller.id, is_active=True
+        )
+        for i in range(licenses)
+    ])
+    ticket_id = None
+    for t in range(tickets):
+        ticket = Ticket(title=f"Ticket {t}", description="seeded", reseller_id=reseller.id)
+        db.add(ticket)
+        db.flush()
+        ticket_id = ticket.id
+        for m in range(messages):
+            message = TicketMessage(
+                ticket_id=ticket.id, sender_type="admin" if m % 2 else "reseller",
+                sender_id=admin.id if m % 2 else reseller.id, message=f"message {m}",
+                is_internal_note=(m % 5 == 4)
+            )
+            db.add(message)
+            db.flush()
+            db.add(TicketAttachment(message_id=message.id, attachment_type="link", link_url="https://example.com"))
+    db.commit()
+    tokens = {
+        "admin": create_access_token({"admin_id": admin.id, "type": "admin"})[0],
+        "reseller": create_access_token({"reseller_id": reseller.id, "type": "reseller"})[0],
+    }
+    db.close()
+    return tokens, ticket_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--verbose", action="store_true", help="print the statements of every endpoint")
+    args = parser.parse_args()
+
+    failures = 0
+    with TestClient(app) as client:
+        tokens, ticket_id = seed()
+        for role, path in (("admin", "/api/admin/stats"), ("reseller", "/api/reseller/profile")):
+            client.get(path, headers={"Authorization": f"Bearer {tokens[role]}"})
+        for role, method, path, budget in BUDGETS:
+            url = path.format(ticket_id=ticket_id)
+            headers = {"Authorization": f"Bearer {tokens[role]}"}
+            try:
+                with assert_max_queries(engine, budget, f"{method} {path}") as counter:
+                    response = client.request(method, url, headers=headers)
+                ok = response.status_code < 400
+            except QueryBudgetExceeded:
+                ok = False
+            failures += not ok
+            print(f"{'ok  ' if ok else 'FAIL'} {counter.count:>3}/{budget:<3} {response.status_code} {method} {path}")
+            if args.verbose or not ok:
+                for sql in counter.statements:
+                    print(f"        {' '.join(sql.split())[:160]}")
+
+    os.unlink(_scratch.name)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
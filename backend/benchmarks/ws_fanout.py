@@ -0,0 +1,100 @@
+"""
+WebSocket fan-out throughput benchmark
+
+Connects thousands of simulated sockets to a ConnectionManager and measures
+how fast ticket broadcasts are delivered through the pub/sub bus.
+
+Usage:
+    python -m benchmarks.ws_fanout --sockets 5000 --tickets 500 --messages 2000
+    python -m benchmarks.ws_fanout --pubsub-url redis://localhost:6379/0
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from routes.websocket import ConnectionManager
+from utils.pubsub import create_pubsub
+
+
+class SimulatedWebSocket:
+    """Stands in for a starlette WebSocket, optionally with a slow network"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.received = 0
+        self.closed_code = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text: str):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.received += 1
+
+    async def close(self, code: int = 1000, reason: str = None):
+        self.closed_code = code
+
+
+async def run(sockets: int, tickets: int, messages: int, slow: int, pubsub_url: str):
+    manager = ConnectionManager(bus=create_pubsub(pubsub_url))
+    await manager.start()
+
+    clients = []
+    for i in range(sockets):
+        websocket = SimulatedWebSocket(delay=1.0 if i < slow else 0.0)
+        await manager.connect(websocket, i % tickets, f"admin_{i}")
+        clients.append(websocket)
+
+    expected = 0
+    started = time.perf_counter()
+    for i in range(messages):
+        ticket_id = random.randrange(tickets)
+        expected += len(manager.ticket_connections.get(ticket_id, ()))
+        await manager.broadcast_to_ticket(ticket_id, {
+            "type": "new_message",
+            "ticket_id": ticket_id,
+            "message": {"id": i, "message": "x" * 200}
+        })
+        if i % 100 == 0:
+            await asyncio.sleep(0)
+    publish_elapsed = time.perf_counter() - started
+
+    fast = [ws for ws in clients if not ws.delay]
+    while True:
+        delivered = sum(ws.received for ws in fast)
+        pending = sum(
+            client.queue.qsize() for client in manager.clients.values()
+            if not client.websocket.delay
+        )
+        if not pending or time.perf_counter() - started > 60:
+            break
+        await asyncio.sleep(0.01)
+    total_elapsed = time.perf_counter() - started
+
+    dropped = sum(1 for ws in clients if ws.closed_code is not None)
+    print(f"sockets={sockets} tickets={tickets} messages={messages} slow={slow}")
+    print(f"publish:  {messages / publish_elapsed:,.0f} broadcasts/s")
+    print(f"delivery: {delivered:,} socket sends in {total_elapsed:.3f}s "
+          f"({delivered / total_elapsed:,.0f} sends/s)")
+    print(f"expected sends (all sockets): {expected:,}, slow consumers dropped: {dropped}")
+
+    for websocket in clients:
+        manager.disconnect(websocket)
+    await manager.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sockets", type=int, default=5000)
+    parser.add_argument("--tickets", type=int, default=500)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--slow", type=int, default=10, help="number of sockets that stall on every send")
+    parser.add_argument("--pubsub-url", default="", help="e.g. redis://localhost:6379/0; in-process when empty")
+    args = parser.parse_args()
+    asyncio.run(run(args.sockets, args.tickets, args.messages, args.slow, args.pubsub_url))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+from sqlalchemy import desc, func, update
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.orm import Session
+from models.log import LogRollup, LoginFailureRollup
+from models.app import App
+from datetime import datetime, timedelta
+
+BUCKET_SIZES = {
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+}
+
+# Range returned when the caller does not pass `since`
+DEFAULT_RANGES = {
+    "minute": timedelta(hours=1),
+    "hour": timedelta(days=1),
+    "day": timedelta(days=30),
+}
+
+MAX_BUCKETS = 2000
+
+
+def bucket_start(moment: datetime, bucket_size: str) -> datetime:
+    moment = moment.replace(second=0, microsecond=0)
+    if bucket_size in ("hour", "day"):
+        moment = moment.replace(minute=0)
+    if bucket_size == "day":
+        moment = moment.replace(hour=0)
+    return moment
+
+
+def _increment(db: Session, model, key: dict):
+    """Add 1 to the counter row identified by `key` (the model's unique columns), creating it if needed"""
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        stmt = insert(model).values(**key, count=1).on_conflict_do_update(
+            index_elements=list(key), set_={"count": model.count + 1}
+        )
+    elif dialect in ("mysql", "mariadb"):
+        stmt = mysql.insert(model).values(**key, count=1).on_duplicate_key_update(count=model.count + 1)
+    else:
+        conditions = [getattr(model, name) == value for name, value in key.items()]
+        if not db.execute(update(model).where(*conditions).values(count=model.count + 1)).rowcount:
+            db.add(model(**key, count=1))
+        return
+    db.execute(stmt)
+
+
+def record_log_event(db: Session, app_id: int, action: str, ip_address: str = None,
+                     username: str = None, at: datetime = None):
+    """Fold one log event into the rollup tables; runs in the caller's transaction"""
+    at = at or datetime.utcnow()
+    for bucket_size in BUCKET_SIZES:
+        _increment(db, LogRollup, {
+            "bucket_size": bucket_size,
+            "bucket_start": bucket_start(at, bucket_size),
+            "app_id": app_id,
+            "action": action
+        })
+    if action == "login_failed":
+        hour = bucket_start(at, "hour")
+        for dimension, value in (("ip", ip_address), ("username", username)):
+            if value:
+                _increment(db, LoginFailureRollup, {
+                    "bucket_start": hour,
+                    "app_id": app_id,
+                    "dimension": dimension,
+                    "value": value[:255]
+                })
+
+
+def _top_failures(db: Session, app_ids: list, dimension: str, since: datetime, until: datetime, top: int):
+    total = func.sum(LoginFailureRollup.count).label("count")
+    rows = db.query(LoginFailureRollup.value, total).filter(
+        LoginFailureRollup.app_id.in_(app_ids),
+        LoginFailureRollup.dimension == dimension,
+        LoginFailureRollup.bucket_start >= bucket_start(since, "hour"),
+        LoginFailureRollup.bucket_start < until
+    ).group_by(LoginFailureRollup.value).order_by(desc(total), LoginFailureRollup.value).limit(top).all()
+    return [{"value": value, "count": int(count)} for value, count in rows]
+
+
+def get_log_analytics(
+    db: Session,
+    admin_id: int,
+    bucket_size: str = "hour",
+    since: datetime = None,
+    until: datetime = None,
+    app_id: int = None,
+    top: int = 10
+):
+    """Event counts per app, action and bucket plus the top failing IPs/usernames, read from the rollups"""
+    if bucket_size not in BUCKET_SIZES:
+        raise ValueError(f"bucket must be one of: {', '.join(BUCKET_SIZES)}")
+    until = until or datetime.utcnow()
+    since = bucket_start(since or until - DEFAULT_RANGES[bucket_size], bucket_size)
+    if since >= until:
+        raise ValueError("since must be before until")
+    if (until - since) / BUCKET_SIZES[bucket_size] > MAX_BUCKETS:
+        raise ValueError(f"Range too large for {bucket_size} buckets (max {MAX_BUCKETS})")
+
+    apps_query = db.query(App.id, App.name).filter(App.admin_id == admin_id)
+    if app_id:
+        apps_query = apps_query.filter(App.id == app_id)
+    apps = dict(apps_query.all())
+
+    rows = db.query(
+        LogRollup.bucket_start, LogRollup.app_id, LogRollup.action, LogRollup.count
+    ).filter(
+        LogRollup.bucket_size == bucket_size,
+        LogRollup.app_id.in_(list(apps)),
+        LogRollup.bucket_start >= since,
+        LogRollup.bucket_start < until
+    ).order_by(LogRollup.bucket_start, LogRollup.app_id).all()
+
+    series = {}
+    totals = {}
+    for start, row_app_id, action, count in rows:
+        point = series.setdefault((start, row_app_id), {
+            "start": start,
+            "app_id": row_app_id,
+            "app_name": apps[row_app_id],
+            "counts": {}
+        })
+        point["counts"][action] = count
+        totals[action] = totals.get(action, 0) + count
+
+    return {
+        "bucket": bucket_size,
+        "since": since,
+        "until": until,
+        "totals": totals,
+        "series": list(series.values()),
+        "top_failed_ips": _top_failures(db, list(apps), "ip", since, until, top),
+        "top_failed_usernames": _top_failures(db, list(apps), "username", since, until, top),
+    }
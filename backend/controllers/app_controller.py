@@ -45,12 +45,3 @@ def update_app(db: Session, app_id: int, app_data: AppUpdate, admin_id: int):
     db.refresh(app)
     return app
 
-
-def delete_app(db: Session, app_id: int, admin_id: int):
-    app = db.query(App).filter(App.id == app_id, App.admin_id == admin_id).first()
-    if not app:
-        return False
-    db.delete(app)
-    db.commit()
-    return True
-
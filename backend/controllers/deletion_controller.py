@@ -0,0 +1,82 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import delete, func, select, update
+from models.app import App
+from models.user import User
+from models.license import License
+from models.log import Log, LogRollup, LoginFailureRollup
+from models.file import File
+from models.variable import Variable
+from models.reseller import CreditTransactionLicense, ResellerApplication
+from typing import Dict, Iterator, List, Tuple
+import secrets
+
+
+def app_deletion_steps(app_id: int) -> list:
+    """(model, condition) pairs removing an app and everything under it, children first.
+
+    The app row goes last, so a purge that stops half way is simply
+    started again and carries on with what is left.
+    """
+    license_ids = select(License.id).where(License.app_id == app_id)
+    return [
+        (CreditTransactionLicense, CreditTransactionLicense.license_id.in_(license_ids)),
+        (License, License.app_id == app_id),
+        (Log, Log.app_id == app_id),
+        (LogRollup, LogRollup.app_id == app_id),
+        (LoginFailureRollup, LoginFailureRollup.app_id == app_id),
+        (User, User.app_id == app_id),
+        (Variable, Variable.app_id == app_id),
+        (ResellerApplication, ResellerApplication.app_id == app_id),
+        (File, File.app_id == app_id),
+        (App, App.id == app_id),
+    ]
+
+
+def user_deletion_steps(user_id: int) -> list:
+    """(model, condition) pairs removing a user with their licenses and logs, the user row last"""
+    license_ids = select(License.id).where(License.user_id == user_id)
+    return [
+        (CreditTransactionLicense, CreditTransactionLicense.license_id.in_(license_ids)),
+        (License, License.user_id == user_id),
+        (Log, Log.user_id == user_id),
+        (User, User.id == user_id),
+    ]
+
+
+def count_deletion_rows(db: Session, steps: list) -> Dict[str, int]:
+    return {
+        model.__tablename__: db.scalar(select(func.count()).select_from(model).where(condition))
+        for model, condition in steps
+    }
+
+
+def revoke_app_secret(db: Session, app_id: int):
+    """Give the app a random secret so clients can no longer add rows to it while it is purged"""
+    db.execute(update(App).where(App.id == app_id).values(secret=secrets.token_hex(32)))
+    db.commit()
+
+
+def delete_in_chunks(db: Session, model, condition, chunk_size: int) -> Iterator[Tuple[int, List[str]]]:
+    """Delete matching rows in primary-key order, one chunk per transaction.
+
+    Each chunk reads the next `chunk_size` ids after the last one seen and
+    deletes that id range, so every statement touches a bounded number of
+    rows and nothing is loaded into the session. Yields (rows deleted, file
+    paths of deleted File rows) after each commit.
+    """
+    columns = (model.id, File.file_path) if model is File else (model.id,)
+    last_id = 0
+    while True:
+        rows = db.execute(
+            select(*columns).where(condition, model.id > last_id).order_by(model.id).limit(chunk_size)
+        ).all()
+        if not rows:
+            return
+        result = db.execute(
+            delete(model)
+            .where(condition, model.id >= rows[0][0], model.id <= rows[-1][0])
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        last_id = rows[-1][0]
+        yield result.rowcount, [row[1] for row in rows] if model is File else []
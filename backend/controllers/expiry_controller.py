@@ -0,0 +1,90 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from models.license import License
+from models.user import User
+from models.sweep import SweepWatermark
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+
+def expire_licenses(db: Session, now: datetime, batch_size: int) -> Dict[int, List[str]]:
+    """Deactivate every active license whose expires_at has passed, `batch_size` rows per transaction.
+
+    Candidates come from the (is_active, expires_at) index. Only rows this call
+    actually flipped are returned (app_id -> keys), so concurrent sweepers in
+    other workers never report the same license twice.
+    """
+    expired = defaultdict(list)
+    returning = db.get_bind().dialect.update_returning
+    while True:
+        ids = db.execute(
+            select(License.id)
+            .where(License.is_active == True, License.expires_at <= now)
+            .order_by(License.expires_at)
+            .limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            break
+        stmt = (
+            update(License)
+            .where(License.id.in_(ids), License.is_active == True)
+            .values(is_active=False)
+            .execution_options(synchronize_session=False)
+        )
+        if returning:
+            rows = db.execute(stmt.returning(License.app_id, License.key)).all()
+        else:
+            # e.g. MySQL: lock the batch, then flip exactly the rows that were read
+            rows = db.execute(
+                select(License.app_id, License.key)
+                .where(License.id.in_(ids), License.is_active == True)
+                .with_for_update()
+            ).all()
+            db.execute(stmt)
+        db.commit()
+        for app_id, key in rows:
+            expired[app_id].append(key)
+        if len(ids) < batch_size:
+            break
+    return dict(expired)
+
+
+def expired_subscriptions(db: Session, since: datetime, until: datetime) -> Dict[int, List[Tuple[int, str]]]:
+    """Users whose expiry_timestamp fell in (since, until], as app_id -> [(user_id, username)]"""
+    rows = db.execute(
+        select(User.app_id, User.id, User.username)
+        .where(User.expiry_timestamp > since, User.expiry_timestamp <= until)
+    ).all()
+    expired = defaultdict(list)
+    for app_id, user_id, username in rows:
+        expired[app_id].append((user_id, username))
+    return dict(expired)
+
+
+def claim_sweep_window(db: Session, name: str, now: datetime) -> Optional[Tuple[datetime, datetime]]:
+    """Claim (watermark, now] for this worker, or None when there is nothing to claim.
+
+    The watermark is stored in the database, so a window continues across
+    restarts and covers any downtime. Moving it is a compare-and-set
+    UPDATE, so when several workers sweep the same window exactly one of
+    them wins. The first sweep ever only stores the watermark.
+    """
+    since = db.scalar(select(SweepWatermark.until).where(SweepWatermark.name == name))
+    if since is None:
+        db.add(SweepWatermark(name=name, until=now))
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()  # Another worker stored it first
+        return None
+    if since >= now:
+        return None
+    result = db.execute(
+        update(SweepWatermark)
+        .where(SweepWatermark.name == name, SweepWatermark.until == since)
+        .values(until=now)
+    )
+    db.commit()
+    return (since, now) if result.rowcount == 1 else None
@@ -1,11 +1,15 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from models.reseller import Reseller, CreditTransaction, ResellerApplication
+from sqlalchemy import desc, insert, select, update
+from models.reseller import Reseller, CreditTransaction, CreditTransactionLicense, ResellerApplication
+from models.license import License
+from models.app import App
 from models.ticket import Ticket, TicketStatus
 from security.password import hash_password, verify_password
+from security.principal_cache import principal_cache
 from schemas.reseller import ResellerCreate, ResellerUpdate, CreditAssignRequest
 from decimal import Decimal
-from datetime import datetime
+from datetime import datetime, timedelta
+from utils.license_generator import generate_license_key
 
 
 def create_reseller(db: Session, reseller_data: ResellerCreate, admin_id: int):
@@ -73,34 +77,123 @@ def update_reseller(db: Session, reseller_id: int, reseller_data: ResellerUpdate
         setattr(reseller, key, value)
     
     db.commit()
+    principal_cache.invalidate("reseller", reseller_id)
     db.refresh(reseller)
     return reseller
 
 
-def assign_credits(db: Session, credit_data: CreditAssignRequest, admin_id: int):
-    reseller = db.query(Reseller).filter(Reseller.id == credit_data.reseller_id).first()
-    if not reseller:
-        raise ValueError("Reseller not found")
-    
-    new_balance = reseller.credits + credit_data.amount
-    reseller.credits = new_balance
-    
+def apply_credit_change(
+    db: Session,
+    reseller_id: int,
+    amount: Decimal,
+    transaction_type: str,
+    description: str,
+    admin_id: int = None,
+    ticket_id: int = None
+) -> CreditTransaction:
+    """Atomically add `amount` (negative to debit) to a reseller's balance and stage the ledger row.
+
+    The balance is changed with a single UPDATE that refuses to go below zero, so
+    concurrent purchases can never overdraw. The caller commits.
+    """
+    stmt = update(Reseller).where(Reseller.id == reseller_id)
+    if amount < 0:
+        stmt = stmt.where(Reseller.credits >= -amount)
+    stmt = stmt.values(credits=Reseller.credits + amount).execution_options(synchronize_session=False)
+
+    if db.get_bind().dialect.update_returning:
+        new_balance = db.execute(stmt.returning(Reseller.credits)).scalar_one_or_none()
+    else:
+        # e.g. MySQL: the UPDATE holds the row lock, so reading it back in the same transaction is safe
+        new_balance = None
+        if db.execute(stmt).rowcount:
+            new_balance = db.execute(select(Reseller.credits).where(Reseller.id == reseller_id)).scalar_one()
+
+    if new_balance is None:
+        available = db.execute(select(Reseller.credits).where(Reseller.id == reseller_id)).scalar_one_or_none()
+        db.rollback()
+        if available is None:
+            raise ValueError("Reseller not found")
+        raise ValueError(f"Insufficient credits. Required: ${-amount}, Available: ${available}")
+
     transaction = CreditTransaction(
-        reseller_id=reseller.id,
-        amount=credit_data.amount,
+        reseller_id=reseller_id,
+        amount=amount,
         balance_after=new_balance,
-        transaction_type="admin_assign",
-        description=credit_data.description or "Credits assigned by admin",
-        admin_id=admin_id
+        transaction_type=transaction_type,
+        description=description,
+        admin_id=admin_id,
+        ticket_id=ticket_id
     )
     db.add(transaction)
+    return transaction
+
+
+def assign_credits(db: Session, credit_data: CreditAssignRequest, admin_id: int):
+    transaction = apply_credit_change(
+        db,
+        credit_data.reseller_id,
+        credit_data.amount,
+        "admin_assign",
+        credit_data.description or "Credits assigned by admin",
+        admin_id=admin_id
+    )
     db.commit()
-    db.refresh(reseller)
     db.refresh(transaction)
     
     return transaction
 
 
+def purchase_licenses(db: Session, reseller_id: int, app, duration_days: int, items: list):
+    """Charge for and create one license per item ({"username", "hwid"}) in a single transaction.
+
+    The whole batch is one atomic debit and one ledger row; every key is linked
+    to that row through credit_transaction_licenses. Returns (transaction, licenses).
+    """
+    cost = Decimal(str(duration_days)) * len(items)  # $1 per day per key
+    if len(items) == 1:
+        description = f"License generated for {app.name} ({duration_days} days)"
+    else:
+        description = f"{len(items)} licenses generated for {app.name} ({duration_days} days each)"
+    transaction = apply_credit_change(db, reseller_id, -cost, "usage", description)
+    db.flush()
+
+    keys = set()
+    while len(keys) < len(items):
+        keys.add(generate_license_key())
+    keys = list(keys)
+    expires_at = datetime.utcnow() + timedelta(days=duration_days)
+    rows = [
+        {
+            "key": key,
+            "app_id": app.id,
+            "username": item.get("username"),
+            "hwid": item.get("hwid"),
+            "expires_at": expires_at,
+            "is_active": True,
+            "created_by_reseller_id": reseller_id
+        }
+        for key, item in zip(keys, items)
+    ]
+    if db.get_bind().dialect.insert_executemany_returning:
+        licenses = db.scalars(insert(License).returning(License), rows).all()
+    else:
+        db.execute(insert(License), rows)
+        licenses = db.query(License).filter(License.key.in_(keys)).all()
+    by_key = {license.key: license for license in licenses}
+    licenses = [by_key[key] for key in keys]
+
+    db.execute(insert(CreditTransactionLicense), [
+        {"credit_transaction_id": transaction.id, "license_id": license.id} for license in licenses
+    ])
+    license_ids = [license.id for license in licenses]
+    db.commit()
+    # Reload the batch in one query rather than one refresh per expired license
+    by_id = {license.id: license for license in db.query(License).filter(License.id.in_(license_ids))}
+    db.refresh(transaction)
+    return transaction, [by_id[license_id] for license_id in license_ids]
+
+
 def get_credit_transactions(db: Session, reseller_id: int = None, limit: int = 100):
     query = db.query(CreditTransaction)
     if reseller_id:
@@ -116,27 +209,26 @@ def approve_topup_request(db: Session, ticket_id: int, admin_id: int):
     if ticket.status == TicketStatus.RESOLVED:
         raise ValueError("Topup request already processed")
     
-    reseller = db.query(Reseller).filter(Reseller.id == ticket.reseller_id).first()
-    if not reseller:
-        raise ValueError("Reseller not found")
-    
-    new_balance = reseller.credits + ticket.topup_amount
-    reseller.credits = new_balance
+    # Claim the ticket first so two admins approving at once cannot both credit it
+    claimed = db.execute(
+        update(Ticket)
+        .where(Ticket.id == ticket_id, Ticket.status != TicketStatus.RESOLVED)
+        .values(status=TicketStatus.RESOLVED, resolved_at=datetime.utcnow(), assigned_to_admin_id=admin_id)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not claimed:
+        db.rollback()
+        raise ValueError("Topup request already processed")
     
-    transaction = CreditTransaction(
-        reseller_id=reseller.id,
-        amount=ticket.topup_amount,
-        balance_after=new_balance,
-        transaction_type="topup_approved",
-        description=f"Topup approved for ticket #{ticket.id}",
+    transaction = apply_credit_change(
+        db,
+        ticket.reseller_id,
+        ticket.topup_amount,
+        "topup_approved",
+        f"Topup approved for ticket #{ticket.id}",
         admin_id=admin_id,
         ticket_id=ticket_id
     )
-    db.add(transaction)
-    
-    ticket.status = TicketStatus.RESOLVED
-    ticket.resolved_at = datetime.utcnow()
-    ticket.assigned_to_admin_id = admin_id
     
     db.commit()
     db.refresh(transaction)
@@ -149,12 +241,11 @@ def delete_reseller(db: Session, reseller_id: int):
         return False
     db.delete(reseller)
     db.commit()
+    principal_cache.invalidate("reseller", reseller_id)
     return True
 
 
 def assign_app_to_reseller(db: Session, reseller_id: int, app_id: int):
-    from models.app import App
-    
     reseller = db.query(Reseller).filter(Reseller.id == reseller_id).first()
     if not reseller:
         raise ValueError("Reseller not found")
@@ -199,22 +290,19 @@ def remove_app_from_reseller(db: Session, reseller_id: int, app_id: int):
 
 
 def get_reseller_applications(db: Session, reseller_id: int):
-    from models.app import App
-    
-    assignments = db.query(ResellerApplication).filter(
+    rows = db.query(ResellerApplication, App).join(
+        App, App.id == ResellerApplication.app_id
+    ).filter(
         ResellerApplication.reseller_id == reseller_id,
         ResellerApplication.is_active == True
     ).all()
     
-    apps = []
-    for assignment in assignments:
-        app = db.query(App).filter(App.id == assignment.app_id).first()
-        if app:
-            apps.append({
-                "id": app.id,
-                "name": app.name,
-                "version": app.version,
-                "assigned_at": assignment.created_at
-            })
-    return apps
-
+    return [
+        {
+            "id": app.id,
+            "name": app.name,
+            "version": app.version,
+            "assigned_at": assignment.created_at
+        }
+        for assignment, app in rows
+    ]
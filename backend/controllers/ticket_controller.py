@@ -1,6 +1,8 @@
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import desc
-from models.ticket import Ticket, TicketMessage, TicketAttachment, TicketStatus, TicketPriority, TicketType
+from sqlalchemy.orm import Session, aliased, selectinload, with_loader_criteria
+from sqlalchemy import desc, func, and_, update
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from models.ticket import Ticket, TicketMessage, TicketAttachment, TicketRead, TicketStatus, TicketPriority, TicketType
 from schemas.ticket import TicketCreate, TicketUpdate, TicketMessageCreate, TicketAttachmentCreate
 from datetime import datetime
 
@@ -25,9 +27,12 @@ def create_ticket(db: Session, ticket_data: TicketCreate, reseller_id: int):
     return ticket
 
 
+MESSAGE_PREVIEW_LENGTH = 120
+
+
 def get_tickets(db: Session, reseller_id: int = None, status: str = None, limit: int = 100):
     query = db.query(Ticket).options(
-        joinedload(Ticket.messages).joinedload(TicketMessage.attachments)
+        selectinload(Ticket.messages).selectinload(TicketMessage.attachments)
     )
     if reseller_id:
         query = query.filter(Ticket.reseller_id == reseller_id)
@@ -36,15 +41,170 @@ def get_tickets(db: Session, reseller_id: int = None, status: str = None, limit:
     return query.order_by(desc(Ticket.created_at)).limit(limit).all()
 
 
+def get_ticket_summaries(
+    db: Session,
+    viewer_type: str,
+    viewer_id: int,
+    reseller_id: int = None,
+    status: str = None,
+    limit: int = 100
+):
+    """List tickets with message count, last message preview and an unread flag.
+
+    Messages are aggregated in subqueries instead of being loaded, and internal
+    notes are left out of every figure when the viewer is a reseller.
+    """
+    visible = [TicketMessage.is_internal_note == False] if viewer_type == "reseller" else []
+    
+    stats = db.query(
+        TicketMessage.ticket_id.label("ticket_id"),
+        func.count(TicketMessage.id).label("message_count"),
+        func.max(TicketMessage.id).label("last_message_id")
+    ).filter(*visible).group_by(TicketMessage.ticket_id).subquery()
+    
+    incoming = db.query(
+        TicketMessage.ticket_id.label("ticket_id"),
+        func.max(TicketMessage.created_at).label("last_incoming_at")
+    ).filter(
+        TicketMessage.sender_type != viewer_type, *visible
+    ).group_by(TicketMessage.ticket_id).subquery()
+    
+    last_message = aliased(TicketMessage)
+    
+    query = db.query(
+        Ticket,
+        func.coalesce(stats.c.message_count, 0),
+        func.substr(last_message.message, 1, MESSAGE_PREVIEW_LENGTH),
+        last_message.created_at,
+        last_message.sender_type,
+        incoming.c.last_incoming_at,
+        TicketRead.last_read_at
+    ).outerjoin(
+        stats, stats.c.ticket_id == Ticket.id
+    ).outerjoin(
+        last_message, last_message.id == stats.c.last_message_id
+    ).outerjoin(
+        incoming, incoming.c.ticket_id == Ticket.id
+    ).outerjoin(
+        TicketRead, and_(
+            TicketRead.ticket_id == Ticket.id,
+            TicketRead.reader_type == viewer_type,
+            TicketRead.reader_id == viewer_id
+        )
+    )
+    if reseller_id:
+        query = query.filter(Ticket.reseller_id == reseller_id)
+    if status:
+        query = query.filter(Ticket.status == status)
+    rows = query.order_by(desc(Ticket.created_at), desc(Ticket.id)).limit(limit).all()
+    
+    summaries = []
+    for ticket, message_count, preview, last_at, last_sender, last_incoming_at, last_read_at in rows:
+        summaries.append({
+            "id": ticket.id,
+            "title": ticket.title,
+            "description": ticket.description,
+            "status": ticket.status,
+            "priority": ticket.priority,
+            "ticket_type": ticket.ticket_type,
+            "topup_amount": ticket.topup_amount,
+            "assigned_to_admin_id": ticket.assigned_to_admin_id,
+            "created_at": ticket.created_at,
+            "updated_at": ticket.updated_at,
+            "resolved_at": ticket.resolved_at,
+            "reseller_id": ticket.reseller_id,
+            "message_count": message_count,
+            "last_message_preview": preview,
+            "last_message_at": last_at,
+            "last_message_sender_type": last_sender,
+            "unread": last_incoming_at is not None and (
+                last_read_at is None or last_incoming_at > last_read_at
+            )
+        })
+    return summaries
+
+
 def get_ticket_by_id(db: Session, ticket_id: int, reseller_id: int = None):
     query = db.query(Ticket).options(
-        joinedload(Ticket.messages).joinedload(TicketMessage.attachments)
+        selectinload(Ticket.messages).selectinload(TicketMessage.attachments)
     ).filter(Ticket.id == ticket_id)
     if reseller_id:
         query = query.filter(Ticket.reseller_id == reseller_id)
     return query.first()
 
 
+def get_reseller_ticket(db: Session, ticket_id: int, reseller_id: int):
+    """Load a reseller's ticket with its thread, leaving internal notes in the database.
+
+    The criteria is applied in SQL to the messages load (and any lazy load it
+    triggers); populate_existing makes sure a thread already in the session is
+    replaced by the filtered one.
+    """
+    return db.query(Ticket).options(
+        selectinload(Ticket.messages).selectinload(TicketMessage.attachments),
+        with_loader_criteria(TicketMessage, TicketMessage.is_internal_note == False)
+    ).filter(
+        Ticket.id == ticket_id,
+        Ticket.reseller_id == reseller_id
+    ).populate_existing().first()
+
+
+def ticket_exists(db: Session, ticket_id: int, reseller_id: int = None) -> bool:
+    query = db.query(Ticket.id).filter(Ticket.id == ticket_id)
+    if reseller_id:
+        query = query.filter(Ticket.reseller_id == reseller_id)
+    return query.first() is not None
+
+
+def get_ticket_messages(
+    db: Session,
+    ticket_id: int,
+    before: int = None,
+    limit: int = 50,
+    include_internal: bool = True
+):
+    """Return one page of a ticket's messages, oldest first, and the cursor for older ones"""
+    query = db.query(TicketMessage).options(
+        selectinload(TicketMessage.attachments)
+    ).filter(TicketMessage.ticket_id == ticket_id)
+    if not include_internal:
+        query = query.filter(TicketMessage.is_internal_note == False)
+    if before:
+        query = query.filter(TicketMessage.id < before)
+    
+    messages = query.order_by(desc(TicketMessage.id)).limit(limit + 1).all()
+    next_cursor = None
+    if len(messages) > limit:
+        messages = messages[:limit]
+        next_cursor = messages[-1].id
+    messages.reverse()
+    return {"messages": messages, "next_cursor": next_cursor}
+
+
+def mark_ticket_read(db: Session, ticket_id: int, reader_type: str, reader_id: int):
+    """Upsert the reader's last_read_at; concurrent reads of one ticket never race on the unique key"""
+    key = {"ticket_id": ticket_id, "reader_type": reader_type, "reader_id": reader_id}
+    now = datetime.utcnow()
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        db.execute(insert(TicketRead).values(**key, last_read_at=now).on_conflict_do_update(
+            index_elements=list(key), set_={"last_read_at": now}
+        ))
+    elif dialect in ("mysql", "mariadb"):
+        db.execute(mysql.insert(TicketRead).values(**key, last_read_at=now).on_duplicate_key_update(last_read_at=now))
+    else:
+        conditions = [getattr(TicketRead, name) == value for name, value in key.items()]
+        if not db.execute(update(TicketRead).where(*conditions).values(last_read_at=now)).rowcount:
+            try:
+                with db.begin_nested():
+                    db.add(TicketRead(**key, last_read_at=now))
+            except IntegrityError:
+                # Lost the race to a concurrent read; its row is there now
+                db.execute(update(TicketRead).where(*conditions).values(last_read_at=now))
+    db.commit()
+
+
 def update_ticket(db: Session, ticket_id: int, ticket_data: TicketUpdate, reseller_id: int = None):
     query = db.query(Ticket).filter(Ticket.id == ticket_id)
     if reseller_id:
@@ -0,0 +1,190 @@
+import re
+from sqlalchemy import Float, Integer, String, desc, exists, or_, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from models.ticket import Ticket, TicketMessage
+
+# Which full-text implementation the current database supports:
+# "fts5" (SQLite), "postgres" (tsvector + GIN) or "like" as a last resort
+_search_backend = None
+
+SQLITE_FTS_DDL = [
+    # External-content FTS5 tables: the text lives in tickets/ticket_messages,
+    # the index is kept in sync by the triggers below
+    "CREATE VIRTUAL TABLE IF NOT EXISTS ticket_fts USING fts5("
+    "title, description, content='tickets', content_rowid='id', tokenize='unicode61')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS ticket_message_fts USING fts5("
+    "message, content='ticket_messages', content_rowid='id', tokenize='unicode61')",
+    """CREATE TRIGGER IF NOT EXISTS tickets_fts_ai AFTER INSERT ON tickets BEGIN
+        INSERT INTO ticket_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS tickets_fts_ad AFTER DELETE ON tickets BEGIN
+        INSERT INTO ticket_fts(ticket_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS tickets_fts_au AFTER UPDATE OF title, description ON tickets BEGIN
+        INSERT INTO ticket_fts(ticket_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO ticket_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS ticket_messages_fts_ai AFTER INSERT ON ticket_messages BEGIN
+        INSERT INTO ticket_message_fts(rowid, message) VALUES (new.id, new.message);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS ticket_messages_fts_ad AFTER DELETE ON ticket_messages BEGIN
+        INSERT INTO ticket_message_fts(ticket_message_fts, rowid, message) VALUES ('delete', old.id, old.message);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS ticket_messages_fts_au AFTER UPDATE OF message ON ticket_messages BEGIN
+        INSERT INTO ticket_message_fts(ticket_message_fts, rowid, message) VALUES ('delete', old.id, old.message);
+        INSERT INTO ticket_message_fts(rowid, message) VALUES (new.id, new.message);
+    END""",
+]
+
+TICKET_DOCUMENT = "coalesce(title, '') || ' ' || coalesce(description, '')"
+
+POSTGRES_FTS_DDL = [
+    # Expression indexes are maintained by Postgres itself, so no triggers are needed
+    f"CREATE INDEX IF NOT EXISTS ix_tickets_fts ON tickets "
+    f"USING GIN (to_tsvector('simple', {TICKET_DOCUMENT}))",
+    "CREATE INDEX IF NOT EXISTS ix_ticket_messages_fts ON ticket_messages "
+    "USING GIN (to_tsvector('simple', message))",
+]
+
+SQLITE_HITS = """
+    SELECT ticket_id, MAX(score) AS score, snippet, message_id FROM (
+        SELECT ticket_fts.rowid AS ticket_id,
+               -bm25(ticket_fts, 2.0, 1.0) AS score,
+               snippet(ticket_fts, -1, '<mark>', '</mark>', '...', 16) AS snippet,
+               NULL AS message_id
+        FROM ticket_fts WHERE ticket_fts MATCH :q
+        UNION ALL
+        SELECT m.ticket_id,
+               -bm25(ticket_message_fts),
+               snippet(ticket_message_fts, 0, '<mark>', '</mark>', '...', 16),
+               m.id
+        FROM ticket_message_fts JOIN ticket_messages m ON m.id = ticket_message_fts.rowid
+        WHERE ticket_message_fts MATCH :q AND (:include_internal = 1 OR m.is_internal_note = 0)
+    ) GROUP BY ticket_id
+"""
+
+POSTGRES_HITS = f"""
+    SELECT DISTINCT ON (ticket_id) ticket_id, score, snippet, message_id FROM (
+        SELECT t.id AS ticket_id,
+               2 * ts_rank(to_tsvector('simple', {TICKET_DOCUMENT}), query) AS score,
+               ts_headline('simple', {TICKET_DOCUMENT}, query,
+                           'StartSel=<mark>, StopSel=</mark>, MaxWords=24, MinWords=8') AS snippet,
+               NULL::integer AS message_id
+        FROM tickets t, websearch_to_tsquery('simple', :q) query
+        WHERE to_tsvector('simple', {TICKET_DOCUMENT}) @@ query
+        UNION ALL
+        SELECT m.ticket_id,
+               ts_rank(to_tsvector('simple', m.message), query),
+               ts_headline('simple', m.message, query,
+                           'StartSel=<mark>, StopSel=</mark>, MaxWords=24, MinWords=8'),
+               m.id
+        FROM ticket_messages m, websearch_to_tsquery('simple', :q) query
+        WHERE to_tsvector('simple', m.message) @@ query AND (:include_internal OR NOT m.is_internal_note)
+    ) hits ORDER BY ticket_id, score DESC
+"""
+
+
+def ensure_ticket_search_index(engine: Engine) -> str:
+    """Create the full-text index for the current dialect and return the backend in use"""
+    global _search_backend
+    dialect = engine.dialect.name
+    try:
+        with engine.begin() as conn:
+            if dialect == "sqlite":
+                existed = conn.execute(text(
+                    "SELECT 1 FROM sqlite_master WHERE name = 'ticket_message_fts'"
+                )).first()
+                for statement in SQLITE_FTS_DDL:
+                    conn.execute(text(statement))
+                if not existed:
+                    # Backfill rows written before the index existed
+                    conn.execute(text("INSERT INTO ticket_fts(ticket_fts) VALUES ('rebuild')"))
+                    conn.execute(text("INSERT INTO ticket_message_fts(ticket_message_fts) VALUES ('rebuild')"))
+                _search_backend = "fts5"
+            elif dialect == "postgresql":
+                for statement in POSTGRES_FTS_DDL:
+                    conn.execute(text(statement))
+                _search_backend = "postgres"
+            else:
+                _search_backend = "like"
+    except OperationalError as e:
+        # e.g. SQLite compiled without FTS5
+        print(f"Full-text search unavailable, falling back to LIKE: {e}")
+        _search_backend = "like"
+    return _search_backend
+
+
+def set_search_backend(backend: str):
+    """Adopt a backend recorded by an earlier ensure_ticket_search_index run (fast boot)"""
+    global _search_backend
+    _search_backend = backend
+
+
+def _fts5_query(q: str) -> str:
+    # Quote every term so user input can never be parsed as FTS5 syntax
+    return " ".join(f'"{term}"*' for term in re.findall(r"\w+", q))
+
+
+def _like_pattern(q: str) -> str:
+    # Match the query literally: %, _ and the escape character itself are not wildcards
+    escaped = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def search_tickets(
+    db: Session,
+    q: str,
+    reseller_id: int = None,
+    status: str = None,
+    include_internal: bool = True,
+    limit: int = 20,
+    offset: int = 0
+):
+    """Rank tickets by how well their title, description or messages match `q`.
+
+    Pass include_internal=False for reseller searches so internal notes are never matched.
+    """
+    backend = _search_backend or ensure_ticket_search_index(db.get_bind())
+
+    if backend == "like":
+        pattern = _like_pattern(q)
+        message_match = exists().where(
+            TicketMessage.ticket_id == Ticket.id,
+            TicketMessage.message.ilike(pattern, escape="\\"),
+            *([] if include_internal else [TicketMessage.is_internal_note == False])
+        )
+        query = db.query(Ticket).filter(or_(
+            Ticket.title.ilike(pattern, escape="\\"),
+            Ticket.description.ilike(pattern, escape="\\"),
+            message_match
+        ))
+        if reseller_id:
+            query = query.filter(Ticket.reseller_id == reseller_id)
+        if status:
+            query = query.filter(Ticket.status == status)
+        tickets = query.order_by(desc(Ticket.updated_at)).offset(offset).limit(limit).all()
+        return [(ticket, 0.0, None, None) for ticket in tickets]
+
+    if backend == "fts5":
+        sql, term = SQLITE_HITS, _fts5_query(q)
+    else:
+        sql, term = POSTGRES_HITS, q
+    if not term.strip():
+        return []
+
+    hits = text(sql).bindparams(q=term, include_internal=include_internal).columns(
+        ticket_id=Integer, score=Float, snippet=String, message_id=Integer
+    ).subquery("hits")
+
+    query = db.query(Ticket, hits.c.score, hits.c.snippet, hits.c.message_id).join(
+        hits, hits.c.ticket_id == Ticket.id
+    )
+    if reseller_id:
+        query = query.filter(Ticket.reseller_id == reseller_id)
+    if status:
+        query = query.filter(Ticket.status == status)
+    return query.order_by(desc(hits.c.score), desc(Ticket.id)).offset(offset).limit(limit).all()
@@ -0,0 +1,113 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import delete, func, select, update
+from models.user import User
+from models.app import App
+from models.license import License
+from models.log import Log
+from models.reseller import CreditTransactionLicense
+from schemas.user import BulkUserFilter
+from security.hwid import hash_hwid
+from collections import defaultdict
+from typing import Dict, List, Tuple
+import os
+
+# Users handled per statement/transaction by bulk operations
+BULK_USER_CHUNK = int(os.getenv("BULK_USER_CHUNK", "1000"))
+
+
+def bulk_user_conditions(admin_id: int, criteria: BulkUserFilter) -> list:
+    """WHERE clauses selecting the admin's users that match every given filter"""
+    conditions = []
+    if criteria.user_ids:
+        conditions.append(User.id.in_(criteria.user_ids))
+    if criteria.hwid:
+        # users.hwid stores the digest written at login/registration
+        conditions.append(User.hwid == hash_hwid(criteria.hwid))
+    if criteria.ip_address:
+        conditions.append(User.ip_address == criteria.ip_address)
+    if criteria.reseller_id:
+        conditions.append(User.id.in_(
+            select(License.user_id).where(License.created_by_reseller_id == criteria.reseller_id)
+        ))
+    if criteria.license_batch_id:
+        conditions.append(User.id.in_(
+            select(License.user_id)
+            .join(CreditTransactionLicense, CreditTransactionLicense.license_id == License.id)
+            .where(CreditTransactionLicense.credit_transaction_id == criteria.license_batch_id)
+        ))
+    if not conditions:
+        raise ValueError("At least one filter is required")
+    if criteria.app_id:
+        conditions.append(User.app_id == criteria.app_id)
+    # Always scoped to the admin's own apps
+    conditions.append(User.app_id.in_(select(App.id).where(App.admin_id == admin_id)))
+    return conditions
+
+
+def count_bulk_users(db: Session, conditions: list) -> Dict[int, int]:
+    """Dry run: matching users per app"""
+    rows = db.execute(select(User.app_id, func.count(User.id)).where(*conditions).group_by(User.app_id)).all()
+    return {app_id: count for app_id, count in rows}
+
+
+def _id_batches(db: Session, conditions: list):
+    """Matching user ids in primary-key order, BULK_USER_CHUNK at a time (keyset pagination)"""
+    last_id = 0
+    while True:
+        ids = db.execute(
+            select(User.id).where(*conditions, User.id > last_id).order_by(User.id).limit(BULK_USER_CHUNK)
+        ).scalars().all()
+        if not ids:
+            return
+        yield ids
+        last_id = ids[-1]
+
+
+def _update_in_chunks(db: Session, conditions: list, values: dict) -> Dict[int, List[Tuple[int, str]]]:
+    """Apply `values` to one batch of matching ids per statement; returns app_id -> [(user_id, username)] changed"""
+    changed = defaultdict(list)
+    returning = db.get_bind().dialect.update_returning
+    for ids in _id_batches(db, conditions):
+        where = conditions + [User.id.in_(ids)]
+        stmt = update(User).where(*where).values(**values).execution_options(synchronize_session=False)
+        if returning:
+            rows = db.execute(stmt.returning(User.app_id, User.id, User.username)).all()
+        else:
+            rows = db.execute(select(User.app_id, User.id, User.username).where(*where).with_for_update()).all()
+            db.execute(stmt)
+        db.commit()
+        for app_id, user_id, username in rows:
+            changed[app_id].append((user_id, username))
+    return dict(changed)
+
+
+def bulk_ban_users(db: Session, conditions: list, reason: str = None):
+    return _update_in_chunks(db, conditions + [User.is_banned == False], {"is_banned": True, "ban_reason": reason})
+
+
+def bulk_unban_users(db: Session, conditions: list):
+    return _update_in_chunks(db, conditions + [User.is_banned == True], {"is_banned": False, "ban_reason": None})
+
+
+def bulk_delete_users(db: Session, conditions: list) -> Dict[int, List[Tuple[int, str]]]:
+    """Delete matching users with their logs and licenses (what the ORM cascade would remove), one batch per transaction"""
+    deleted = defaultdict(list)
+    for ids in _id_batches(db, conditions):
+        rows = db.execute(
+            select(User.app_id, User.id, User.username).where(*conditions, User.id.in_(ids))
+        ).all()
+        if not rows:
+            continue
+        user_ids = [user_id for _, user_id, _ in rows]
+        license_ids = select(License.id).where(License.user_id.in_(user_ids))
+        for stmt in (
+            delete(CreditTransactionLicense).where(CreditTransactionLicense.license_id.in_(license_ids)),
+            delete(License).where(License.user_id.in_(user_ids)),
+            delete(Log).where(Log.user_id.in_(user_ids)),
+            delete(User).where(User.id.in_(user_ids)),
+        ):
+            db.execute(stmt.execution_options(synchronize_session=False))
+        db.commit()
+        for app_id, user_id, username in rows:
+            deleted[app_id].append((user_id, username))
+    return dict(deleted)
@@ -1,19 +1,61 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from contextlib import asynccontextmanager
 import uvicorn
+from datetime import datetime
 
-from database import engine, Base
-from routes import auth, admin, api, licenses, users, apps, logs, files, vars, resellers, tickets
+from database import engine, SessionLocal
+from routes import auth, admin, api, licenses, users, apps, logs, files, vars, resellers, tickets, reseller_api
 from routes import websocket
 from middleware.rate_limit import RateLimitMiddleware
+from middleware.metrics import MetricsMiddleware
+from middleware.profiling import ProfilingMiddleware
+from models.admin import Admin
+from models.reseller import Reseller
+from security.jwt import token_cache
+from security.principal_cache import principal_cache
+from utils.metrics import METRICS_TOKEN, instrument_engine, registry
+from utils.schema import ensure_schema
+from utils.slow_queries import slow_query_log
+from utils.loop_monitor import loop_monitor
+from utils.presence import presence
+from utils.expiry_sweeper import expiry_sweeper
+
+instrument_engine(engine)
+slow_query_log.install(engine)
+registry.add_collector("websocket", websocket.manager.gauges)
+registry.add_collector("jwt_cache", token_cache.stats)
+registry.add_collector("principal_cache", principal_cache.stats)
+registry.add_collector("slow_queries", slow_query_log.stats)
+registry.add_collector("event_loop", loop_monitor.stats)
+registry.add_collector("presence", presence.stats)
+registry.add_collector("expiry_sweeper", expiry_sweeper.stats)
+
+
+def warm_caches():
+    db = SessionLocal()
+    try:
+        principal_cache.prime(db, Admin, "admin")
+        principal_cache.prime(db, Reseller, "reseller")
+    finally:
+        db.close()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    Base.metadata.create_all(bind=engine)
+    # Fast boot: skips create_all when the schema marker matches the models
+    ensure_schema(engine)
+    warm_caches()
+    await loop_monitor.start()
+    await websocket.manager.start()
+    presence.start()
+    expiry_sweeper.start()
     yield
+    expiry_sweeper.stop()
+    presence.stop()
+    await websocket.manager.stop()
+    await loop_monitor.stop()
 
 
 app = FastAPI(
@@ -32,6 +74,10 @@ app.add_middleware(
 )
 
 app.add_middleware(RateLimitMiddleware)
+# Inside the metrics middleware so a profile can collect the request's SQL
+app.add_middleware(ProfilingMiddleware)
+# Outermost, so rate-limited and failed requests are measured too
+app.add_middleware(MetricsMiddleware)
 
 # Include auth router first (more specific routes)
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
@@ -47,7 +93,6 @@ app.include_router(files.router, prefix="/api/admin/files", tags=["Files"])
 app.include_router(vars.router, prefix="/api/admin/vars", tags=["Variables"])
 app.include_router(resellers.router, prefix="/api/admin/resellers", tags=["Resellers"])
 app.include_router(tickets.router, prefix="/api/admin/tickets", tags=["Tickets"])
-from routes import reseller_api
 app.include_router(reseller_api.router, prefix="/api/reseller", tags=["Reseller API"])
 
 # WebSocket routes
@@ -59,9 +104,15 @@ async def root():
     return {"message": "SkyLineentication API", "version": "1.0.0"}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    if METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid metrics token")
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/api/time")
 async def server_time():
-    from datetime import datetime
     return {"timestamp": int(datetime.utcnow().timestamp())}
 
 
@@ -3,8 +3,10 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from database import get_db
 from security.jwt import verify_token
+from security.principal_cache import principal_cache
 from models.admin import Admin
 from models.user import User
+from models.reseller import Reseller
 from typing import Optional
 
 security = HTTPBearer(auto_error=False)
@@ -57,7 +59,8 @@ async def get_current_admin(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token"
         )
-    admin = db.query(Admin).filter(Admin.id == admin_id).first()
+    # Served from the principal cache; no query on the hot path
+    admin = principal_cache.get(db, Admin, "admin", admin_id)
     if admin is None or not admin.is_active:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -92,13 +95,24 @@ async def get_current_user(
     return user
 
 
+async def get_current_user_claims(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)
+) -> dict:
+    """User token claims without a database lookup, for high-frequency endpoints like the heartbeat"""
+    payload = verify_token(credentials.credentials) if credentials else None
+    if payload is None or payload.get("type") != "user" or payload.get("user_id") is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials"
+        )
+    return payload
+
+
 async def get_current_reseller(
     request: Request,
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
     db: Session = Depends(get_db)
 ):
-    from models.reseller import Reseller
-    
     token = None
     
     # Try to get token from HTTPBearer first
@@ -132,7 +146,7 @@ async def get_current_reseller(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token"
         )
-    reseller = db.query(Reseller).filter(Reseller.id == reseller_id).first()
+    reseller = principal_cache.get(db, Reseller, "reseller", reseller_id)
     if reseller is None or not reseller.is_active:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
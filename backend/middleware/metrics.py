@@ -0,0 +1,40 @@
+import time
+from utils.metrics import RequestMetrics, current_request, http_latency, http_requests, http_statements
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording latency, status and SQL statement count per route template.
+
+    Labels use the matched route's path ("/api/admin/users/{user_id}"), never the
+    raw URL, so the number of series stays bounded by the number of routes.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = RequestMetrics(scope)
+        token = current_request.set(request)
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            current_request.reset(token)
+            route = request.route
+            method = scope["method"]
+            http_latency.observe(elapsed, method, route)
+            http_requests.inc(method, route, status_code)
+            http_statements.observe(request.statements, route)
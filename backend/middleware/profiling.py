@@ -0,0 +1,80 @@
+import random
+import threading
+import time
+from database import SessionLocal
+from models.admin import Admin
+from security.jwt import verify_token
+from security.principal_cache import principal_cache
+from utils.metrics import current_request
+from utils.profiler import PROFILE_HEADER, PROFILE_INTERVAL_MS, PROFILE_SAMPLE_RATE, StackSampler, profile_store
+
+
+def _requested_by_admin(scope) -> bool:
+    headers = dict(scope["headers"])
+    if not headers.get(PROFILE_HEADER):
+        return False
+    authorization = headers.get(b"authorization", b"").decode("latin-1")
+    if not authorization.lower().startswith("bearer "):
+        return False
+    payload = verify_token(authorization[7:].strip())
+    if not payload or payload.get("type") != "admin" or payload.get("admin_id") is None:
+        return False
+    # Same check as get_current_admin: a deactivated or deleted admin's token is not enough
+    db = SessionLocal()
+    try:
+        admin = principal_cache.get(db, Admin, "admin", payload["admin_id"])
+    finally:
+        db.close()
+    return bool(admin and admin.is_active)
+
+
+class ProfilingMiddleware:
+    """Opt-in statistical profiling of single requests.
+
+    A request is profiled when an admin token sends the profiling header, or
+    when it falls within PROFILE_SAMPLE_RATE. Everything else passes straight
+    through after a header lookup. Mount inside MetricsMiddleware so the SQL
+    statements of the request are captured as well.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if _requested_by_admin(scope):
+            reason = "header"
+        elif PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE:
+            reason = "sampled"
+        else:
+            await self.app(scope, receive, send)
+            return
+
+        profile = profile_store.begin(scope["method"], scope["path"], reason)
+        if profile is None:
+            await self.app(scope, receive, send)
+            return
+
+        request = current_request.get()
+        if request is not None:
+            request.queries = profile.queries
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+            await send(message)
+
+        sampler = StackSampler(threading.get_ident(), PROFILE_INTERVAL_MS / 1000)
+        sampler.start()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profile.duration_ms = (time.perf_counter() - started) * 1000
+            profile.stacks = dict(sampler.stop())
+            if request is not None:
+                profile.route = request.route
+                request.queries = None
+            profile_store.finish(profile)
@@ -3,10 +3,15 @@ from starlette.middleware.base import BaseHTTPMiddleware
 from collections import defaultdict
 from datetime import datetime, timedelta
 from typing import Dict, Tuple
+import os
+from utils.metrics import rate_limit_rejections
+
+# Requests allowed per client IP per minute
+RATE_LIMIT_PER_MINUTE = int(os.getenv("RATE_LIMIT_PER_MINUTE", "60"))
 
 
 class RateLimitMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app, requests_per_minute: int = 60):
+    def __init__(self, app, requests_per_minute: int = RATE_LIMIT_PER_MINUTE):
         super().__init__(app)
         self.requests_per_minute = requests_per_minute
         self.requests: Dict[str, list] = defaultdict(list)
@@ -21,6 +26,7 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         ]
         
         if len(self.requests[client_ip]) >= self.requests_per_minute:
+            rate_limit_rejections.inc()
             raise HTTPException(
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
                 detail="Rate limit exceeded"
@@ -2,13 +2,14 @@ from .user import User
 from .admin import Admin
 from .app import App
 from .license import License
-from .log import Log
+from .log import Log, LogRollup, LoginFailureRollup
 from .file import File
 from .variable import Variable
-from .reseller import Reseller, CreditTransaction, ResellerApplication
-from .ticket import Ticket, TicketMessage, TicketAttachment
+from .reseller import Reseller, CreditTransaction, CreditTransactionLicense, ResellerApplication
+from .ticket import Ticket, TicketMessage, TicketAttachment, TicketRead
+from .sweep import SweepWatermark
 
-__all__ = ["User", "Admin", "App", "License", "Log", "File", "Variable", 
-           "Reseller", "CreditTransaction", "ResellerApplication",
-           "Ticket", "TicketMessage", "TicketAttachment"]
+__all__ = ["User", "Admin", "App", "License", "Log", "LogRollup", "LoginFailureRollup", "File", "Variable", 
+           "Reseller", "CreditTransaction", "CreditTransactionLicense", "ResellerApplication",
+           "Ticket", "TicketMessage", "TicketAttachment", "TicketRead", "SweepWatermark"]
 
@@ -17,9 +17,11 @@ class App(Base):
     created_at = Column(DateTime, server_default=func.now())
     
     admin = relationship("Admin", back_populates="apps")
-    users = relationship("User", back_populates="app", cascade="all, delete-orphan")
-    licenses = relationship("License", back_populates="app", cascade="all, delete-orphan")
-    files = relationship("File", back_populates="app", cascade="all, delete-orphan")
-    variables = relationship("Variable", back_populates="app", cascade="all, delete-orphan")
-    logs = relationship("Log", back_populates="app", cascade="all, delete-orphan")
+    users = relationship("User", back_populates="app", cascade="all, delete-orphan", passive_deletes=True)
+    licenses = relationship("License", back_populates="app", cascade="all, delete-orphan", passive_deletes=True)
+    files = relationship("File", back_populates="app", cascade="all, delete-orphan", passive_deletes=True)
+    variables = relationship("Variable", back_populates="app", cascade="all, delete-orphan", passive_deletes=True)
+    logs = relationship("Log", back_populates="app", cascade="all, delete-orphan", passive_deletes=True)
+    log_rollups = relationship("LogRollup", cascade="all, delete-orphan", passive_deletes=True)
+    login_failure_rollups = relationship("LoginFailureRollup", cascade="all, delete-orphan", passive_deletes=True)
 
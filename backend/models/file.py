@@ -12,7 +12,7 @@ class File(Base):
     file_path = Column(String(500), nullable=False)
     file_size = Column(Integer)
     mime_type = Column(String(100))
-    app_id = Column(Integer, ForeignKey("apps.id"), nullable=False)
+    app_id = Column(Integer, ForeignKey("apps.id", ondelete="CASCADE"), nullable=False, index=True)
     created_at = Column(DateTime, server_default=func.now())
     
     app = relationship("App", back_populates="files")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -6,6 +6,10 @@ from database import Base
 
 class License(Base):
     __tablename__ = "licenses"
+    __table_args__ = (
+        # Drives the expiry sweeper: active licenses in expiry order
+        Index("ix_licenses_active_expires_at", "is_active", "expires_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     key = Column(String(255), unique=True, index=True, nullable=False)  # Using 'key' instead of 'license_key'
@@ -13,8 +17,8 @@ class License(Base):
     hwid = Column(String(255), index=True)
     expires_at = Column(DateTime)  # Using 'expires_at' instead of 'expiry_timestamp'
     is_active = Column(Boolean, default=True)
-    app_id = Column(Integer, ForeignKey("apps.id"), nullable=False)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    app_id = Column(Integer, ForeignKey("apps.id", ondelete="CASCADE"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=True, index=True)
     created_by_reseller_id = Column(Integer, ForeignKey("resellers.id"), nullable=True)
     created_at = Column(DateTime, server_default=func.now())
     
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -12,10 +12,40 @@ class Log(Base):
     ip_address = Column(String(45))
     user_agent = Column(Text)
     details = Column(Text)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
-    app_id = Column(Integer, ForeignKey("apps.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=True, index=True)
+    app_id = Column(Integer, ForeignKey("apps.id", ondelete="CASCADE"), nullable=False, index=True)
     created_at = Column(DateTime, server_default=func.now())
     
     user = relationship("User", back_populates="logs")
     app = relationship("App", back_populates="logs")
 
+
+
+class LogRollup(Base):
+    """Event counts per app and action, kept up to date by create_log"""
+    __tablename__ = "log_rollups"
+    __table_args__ = (
+        UniqueConstraint("bucket_size", "bucket_start", "app_id", "action", name="uq_log_rollup_bucket"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    bucket_size = Column(String(10), nullable=False)  # 'minute', 'hour' or 'day'
+    bucket_start = Column(DateTime, nullable=False)
+    app_id = Column(Integer, ForeignKey("apps.id", ondelete="CASCADE"), nullable=False)
+    action = Column(String(100), nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class LoginFailureRollup(Base):
+    """Hourly login_failed counts per source IP and per attempted username"""
+    __tablename__ = "login_failure_rollups"
+    __table_args__ = (
+        UniqueConstraint("bucket_start", "app_id", "dimension", "value", name="uq_login_failure_rollup_bucket"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    bucket_start = Column(DateTime, nullable=False, index=True)
+    app_id = Column(Integer, ForeignKey("apps.id", ondelete="CASCADE"), nullable=False)
+    dimension = Column(String(20), nullable=False)  # 'ip' or 'username'
+    value = Column(String(255), nullable=False)
+    count = Column(Integer, nullable=False, default=0)
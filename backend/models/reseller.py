@@ -45,6 +45,16 @@ class CreditTransaction(Base):
     reseller = relationship("Reseller", back_populates="credit_transactions")
     admin = relationship("Admin")
     ticket = relationship("Ticket", back_populates="credit_transactions")
+    licenses = relationship("License", secondary="credit_transaction_licenses", viewonly=True)
+
+
+class CreditTransactionLicense(Base):
+    """Links a usage debit to every license it paid for (one row per key in a bulk purchase)"""
+    __tablename__ = "credit_transaction_licenses"
+
+    id = Column(Integer, primary_key=True, index=True)
+    credit_transaction_id = Column(Integer, ForeignKey("credit_transactions.id", ondelete="CASCADE"), nullable=False, index=True)
+    license_id = Column(Integer, ForeignKey("licenses.id", ondelete="CASCADE"), nullable=False, unique=True)
 
 
 class ResellerApplication(Base):
@@ -52,7 +62,7 @@ class ResellerApplication(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     reseller_id = Column(Integer, ForeignKey("resellers.id"), nullable=False, index=True)
-    app_id = Column(Integer, ForeignKey("apps.id"), nullable=False, index=True)
+    app_id = Column(Integer, ForeignKey("apps.id", ondelete="CASCADE"), nullable=False, index=True)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, server_default=func.now())
     
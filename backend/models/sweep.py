@@ -0,0 +1,10 @@
+from sqlalchemy import Column, String, DateTime
+from database import Base
+
+
+class SweepWatermark(Base):
+    """End of the last window a background sweep has handled, shared by every worker"""
+    __tablename__ = "sweep_watermarks"
+
+    name = Column(String(50), primary_key=True)
+    until = Column(DateTime, nullable=False)
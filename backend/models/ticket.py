@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Text, Enum, Numeric
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Text, Enum, Numeric, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -47,6 +47,7 @@ class Ticket(Base):
     assigned_admin = relationship("Admin")
     messages = relationship("TicketMessage", back_populates="ticket", cascade="all, delete-orphan", order_by="TicketMessage.created_at")
     credit_transactions = relationship("CreditTransaction", back_populates="ticket")
+    reads = relationship("TicketRead", cascade="all, delete-orphan")
 
 
 class TicketMessage(Base):
@@ -79,3 +80,14 @@ class TicketAttachment(Base):
     
     message = relationship("TicketMessage", back_populates="attachments")
 
+
+class TicketRead(Base):
+    """Last time an admin or reseller opened a ticket, used for the unread flag"""
+    __tablename__ = "ticket_reads"
+    __table_args__ = (UniqueConstraint("ticket_id", "reader_type", "reader_id"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    ticket_id = Column(Integer, ForeignKey("tickets.id"), nullable=False, index=True)
+    reader_type = Column(String(20), nullable=False)  # 'reseller' or 'admin'
+    reader_id = Column(Integer, nullable=False)
+    last_read_at = Column(DateTime, nullable=False)
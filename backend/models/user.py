@@ -14,14 +14,14 @@ class User(Base):
     hwid = Column(String(255), index=True)
     ip_address = Column(String(45))
     subscription_name = Column(String(100))
-    expiry_timestamp = Column(DateTime)
+    expiry_timestamp = Column(DateTime, index=True)
     account_creation_date = Column(DateTime, server_default=func.now())
     last_login_time = Column(DateTime)
     is_banned = Column(Boolean, default=False)
     ban_reason = Column(Text)
-    app_id = Column(Integer, ForeignKey("apps.id"), nullable=False)
+    app_id = Column(Integer, ForeignKey("apps.id", ondelete="CASCADE"), nullable=False, index=True)
     
     app = relationship("App", back_populates="users")
-    logs = relationship("Log", back_populates="user", cascade="all, delete-orphan")
-    licenses = relationship("License", back_populates="user", cascade="all, delete-orphan")
+    logs = relationship("Log", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
+    licenses = relationship("License", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
 
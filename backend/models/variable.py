@@ -10,7 +10,7 @@ class Variable(Base):
     id = Column(Integer, primary_key=True, index=True)
     key = Column(String(100), nullable=False)
     value = Column(Text)
-    app_id = Column(Integer, ForeignKey("apps.id"), nullable=False)
+    app_id = Column(Integer, ForeignKey("apps.id", ondelete="CASCADE"), nullable=False, index=True)
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
     
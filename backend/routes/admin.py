@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import PlainTextResponse
 from sqlalchemy.orm import Session
 from database import get_db
 from middleware.auth import get_current_admin
@@ -7,8 +8,17 @@ from models.user import User
 from models.app import App
 from models.license import License
 from security.password import hash_password
+from routes.websocket import manager
+from security.jwt import token_cache
+from security.principal_cache import principal_cache
+from controllers.analytics_controller import get_log_analytics
+from utils.profiler import profile_store
+from utils.slow_queries import slow_query_log
+from utils.loop_monitor import loop_monitor
+from utils.deletion_jobs import deletion_jobs
 from pydantic import BaseModel, EmailStr
 from typing import Optional
+from datetime import datetime
 
 router = APIRouter()
 
@@ -39,6 +49,8 @@ async def create_admin(
     db.add(admin)
     db.commit()
     db.refresh(admin)
+    # SQLite may reuse the id of a removed admin; never serve its cached snapshot
+    principal_cache.invalidate("admin", admin.id)
     return {"id": admin.id, "username": admin.username, "email": admin.email}
 
 
@@ -67,3 +79,124 @@ async def get_stats(
         "active_licenses": active_licenses
     }
 
+
+@router.get("/websocket-stats")
+async def get_websocket_stats(
+    current_admin: Admin = Depends(get_current_admin)
+):
+    return manager.gauges()
+
+
+@router.get("/cache-stats")
+async def get_cache_stats(
+    current_admin: Admin = Depends(get_current_admin)
+):
+    return {"jwt": token_cache.stats(), "principals": principal_cache.stats()}
+
+
+@router.get("/profiles")
+async def list_profiles(
+    current_admin: Admin = Depends(get_current_admin)
+):
+    return {"profiles": profile_store.list(), "skipped_while_busy": profile_store.skipped}
+
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(
+    profile_id: int,
+    top: int = Query(20, ge=1, le=200),
+    current_admin: Admin = Depends(get_current_admin)
+):
+    profile = profile_store.get(profile_id)
+    if not profile:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+    return profile.detail(top)
+
+
+@router.get("/profiles/{profile_id}/collapsed", response_class=PlainTextResponse)
+async def get_profile_collapsed(
+    profile_id: int,
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """Collapsed stacks, one `frame;frame;frame count` line each, for flamegraph.pl or speedscope"""
+    profile = profile_store.get(profile_id)
+    if not profile:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+    return profile.collapsed()
+
+
+@router.get("/slow-queries")
+async def get_slow_queries(
+    sort: str = Query("total_ms", pattern="^(total_ms|max_ms|mean_ms|count)$"),
+    limit: int = Query(50, ge=1, le=500),
+    current_admin: Admin = Depends(get_current_admin)
+):
+    return {**slow_query_log.stats(), "queries": slow_query_log.report(sort, limit)}
+
+
+@router.delete("/slow-queries")
+async def clear_slow_queries(
+    current_admin: Admin = Depends(get_current_admin)
+):
+    slow_query_log.clear()
+    return {"message": "Slow query log cleared"}
+
+
+@router.get("/loop-lag")
+async def get_loop_lag(
+    limit: int = Query(20, ge=1, le=200),
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """Routes ranked by how long they blocked the event loop, with the frames that did it"""
+    return {**loop_monitor.stats(), "routes": loop_monitor.report(limit)}
+
+
+@router.get("/loop-lag/collapsed", response_class=PlainTextResponse)
+async def get_loop_lag_collapsed(
+    current_admin: Admin = Depends(get_current_admin)
+):
+    return loop_monitor.collapsed()
+
+
+@router.delete("/loop-lag")
+async def clear_loop_lag(
+    current_admin: Admin = Depends(get_current_admin)
+):
+    loop_monitor.clear()
+    return {"message": "Loop lag report cleared"}
+
+
+@router.get("/deletions")
+async def list_deletions(
+    current_admin: Admin = Depends(get_current_admin)
+):
+    return deletion_jobs.list(current_admin.id)
+
+
+@router.get("/deletions/{job_id}")
+async def get_deletion(
+    job_id: str,
+    current_admin: Admin = Depends(get_current_admin)
+):
+    job = deletion_jobs.get(job_id, current_admin.id)
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Deletion job not found")
+    return job.as_dict()
+
+
+@router.get("/analytics")
+async def get_analytics(
+    bucket: str = "hour",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    app_id: Optional[int] = None,
+    top: int = Query(10, ge=1, le=100),
+    current_admin: Admin = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    if app_id and not db.query(App).filter(App.id == app_id, App.admin_id == current_admin.id).first():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Application not found")
+    try:
+        return get_log_analytics(db, current_admin.id, bucket, since, until, app_id, top)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi.responses import FileResponse as FastAPIFileResponse
 from sqlalchemy.orm import Session
 from database import get_db
 from models.app import App
@@ -6,16 +7,22 @@ from models.user import User
 from models.license import License
 from models.variable import Variable
 from models.file import File
-from security.jwt import create_access_token
+from models.log import Log
+from security.jwt import create_access_token, verify_token
 from security.password import hash_password, verify_password
 from security.hwid import hash_hwid
-from schemas.auth import LoginRequest, LicenseLoginRequest, RegisterRequest, InitRequest, AuthResponse
+from security.login_throttle import login_tracker
+from security.principal_cache import principal_cache
+from schemas.auth import LoginRequest, LicenseLoginRequest, RegisterRequest, InitRequest, AuthResponse, BootstrapRequest
 from schemas.user import UserInfoResponse
 from utils.logger import create_log
 from utils.webhook import send_webhook
 from datetime import datetime, timedelta
-from middleware.auth import get_current_user
+from typing import Optional
+from middleware.auth import get_current_user, get_current_user_claims
+from utils.presence import presence
 import asyncio
+import os
 
 router = APIRouter()
 
@@ -30,10 +37,8 @@ def get_app_by_secret(db: Session, secret: str):
     return app
 
 
-@router.post("/init")
-async def init(request: InitRequest, db: Session = Depends(get_db)):
-    app = get_app_by_secret(db, request.app_secret)
-    if app.force_update and request.version != app.version:
+def version_check(app: App, version: Optional[str]) -> dict:
+    if app.force_update and version != app.version:
         return {
             "success": False,
             "message": "Update required",
@@ -46,13 +51,26 @@ async def init(request: InitRequest, db: Session = Depends(get_db)):
     }
 
 
-@router.post("/login", response_model=AuthResponse)
-async def login(
-    request: LoginRequest,
-    client_request: Request,
-    db: Session = Depends(get_db)
-):
+@router.post("/init")
+async def init(request: InitRequest, db: Session = Depends(get_db)):
     app = get_app_by_secret(db, request.app_secret)
+    return version_check(app, request.version)
+
+
+def check_login_throttle(app_secret: str, username: str, client_ip: str):
+    # Locked-out attempts are refused before any database or bcrypt work
+    retry_after = login_tracker.retry_after(app_secret, username, client_ip)
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Too many failed login attempts. Try again in {retry_after} seconds",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+
+def password_login(db: Session, app: App, request: LoginRequest, client_request: Request):
+    """Username/password login against an already resolved app; returns (user, AuthResponse)"""
+    client_ip = client_request.client.host
     user = db.query(User).filter(
         User.username == request.username,
         User.app_id == app.id
@@ -61,15 +79,30 @@ async def login(
     if not user or not verify_password(request.password, user.password_hash):
         create_log(
             db, app.id, "login_failed",
-            ip_address=client_request.client.host,
+            ip_address=client_ip,
             user_agent=client_request.headers.get("user-agent"),
-            details=f"Failed login attempt for username: {request.username}"
+            details=f"Failed login attempt for username: {request.username}",
+            username=request.username
         )
+        # One log row when lockouts start; attempts refused while locked are only counted
+        lockouts = login_tracker.record_failure(request.app_secret, request.username, client_ip)
+        if lockouts:
+            create_log(
+                db, app.id, "login_locked",
+                ip_address=client_ip,
+                user_agent=client_request.headers.get("user-agent"),
+                details="; ".join(
+                    f"Locked {kind} {value} for {seconds}s ({rejected} attempts refused during the previous lockout)"
+                    for (_, kind, value), seconds, rejected in lockouts
+                )
+            )
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials"
         )
     
+    login_tracker.record_success(request.app_secret, request.username)
+    
     if user.is_banned:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -111,7 +144,7 @@ async def login(
             "ip_address": client_request.client.host
         }))
     
-    return AuthResponse(
+    return user, AuthResponse(
         success=True,
         message="Login successful",
         token=token,
@@ -119,6 +152,17 @@ async def login(
     )
 
 
+@router.post("/login", response_model=AuthResponse)
+async def login(
+    request: LoginRequest,
+    client_request: Request,
+    db: Session = Depends(get_db)
+):
+    check_login_throttle(request.app_secret, request.username, client_request.client.host)
+    app = get_app_by_secret(db, request.app_secret)
+    return password_login(db, app, request, client_request)[1]
+
+
 @router.post("/register", response_model=AuthResponse)
 async def register(
     request: RegisterRequest,
@@ -198,13 +242,8 @@ async def register(
     )
 
 
-@router.post("/license", response_model=AuthResponse)
-async def license_login(
-    request: LicenseLoginRequest,
-    client_request: Request,
-    db: Session = Depends(get_db)
-):
-    app = get_app_by_secret(db, request.app_secret)
+def license_key_login(db: Session, app: App, request: LicenseLoginRequest, client_request: Request):
+    """License key login against an already resolved app; returns (user, AuthResponse)"""
     license_obj = db.query(License).filter(
         License.key == request.license_key,
         License.app_id == app.id,
@@ -277,7 +316,7 @@ async def license_login(
         details=f"License login: {request.license_key}"
     )
     
-    return AuthResponse(
+    return user, AuthResponse(
         success=True,
         message="License authentication successful",
         token=token,
@@ -285,16 +324,30 @@ async def license_login(
     )
 
 
-@router.get("/validate")
-async def validate(
-    current_user: User = Depends(get_current_user),
+@router.post("/license", response_model=AuthResponse)
+async def license_login(
+    request: LicenseLoginRequest,
+    client_request: Request,
     db: Session = Depends(get_db)
 ):
-    if current_user.expiry_timestamp and current_user.expiry_timestamp < datetime.utcnow():
+    app = get_app_by_secret(db, request.app_secret)
+    return license_key_login(db, app, request, client_request)[1]
+
+
+def check_subscription(user: User):
+    if user.expiry_timestamp and user.expiry_timestamp < datetime.utcnow():
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Subscription expired"
         )
+
+
+@router.get("/validate")
+async def validate(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    check_subscription(current_user)
     return {"valid": True, "message": "Token is valid"}
 
 
@@ -316,28 +369,44 @@ async def get_user_info(current_user: User = Depends(get_current_user)):
     return current_user
 
 
-@router.get("/vars")
-async def get_vars(
-    app_secret: str,
+@router.post("/heartbeat")
+async def heartbeat(
+    claims: dict = Depends(get_current_user_claims),
     db: Session = Depends(get_db)
 ):
-    app = get_app_by_secret(db, app_secret)
-    variables = db.query(Variable).filter(Variable.app_id == app.id).all()
+    # Served from the principal cache, so a token that outlives a ban or delete cannot bring the session back
+    user = principal_cache.get(db, User, "user", claims["user_id"], active_column=User.is_banned.isnot(True))
+    if user is None or not user.is_active:
+        presence.remove(claims["app_id"], claims["user_id"])
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found or banned"
+        )
+    presence.heartbeat(claims["app_id"], claims["user_id"])
+    return {"success": True, "next_heartbeat_seconds": int(presence.ttl // 3)}
+
+
+def list_variables(db: Session, app: App) -> dict:
+    variables = db.query(Variable.key, Variable.value).filter(Variable.app_id == app.id).all()
     return {var.key: var.value for var in variables}
 
 
-@router.get("/files")
-async def get_files(
+@router.get("/vars")
+async def get_vars(
     app_secret: str,
     db: Session = Depends(get_db)
 ):
     app = get_app_by_secret(db, app_secret)
+    return list_variables(db, app)
+
+
+def list_files(db: Session, app: App) -> list:
     files = db.query(File).filter(File.app_id == app.id).all()
     return [
         {
             "id": f.id,
             "filename": f.filename,
-            "url": f"/api/files/download/{f.id}?secret={app_secret}",
+            "url": f"/api/files/download/{f.id}?secret={app.secret}",
             "size": f.file_size,
             "mime_type": f.mime_type
         }
@@ -345,13 +414,104 @@ async def get_files(
     ]
 
 
+@router.get("/files")
+async def get_files(
+    app_secret: str,
+    db: Session = Depends(get_db)
+):
+    app = get_app_by_secret(db, app_secret)
+    return list_files(db, app)
+
+
+def token_login(db: Session, app: App, token: str):
+    """Resume with a previously issued token; returns (user, AuthResponse)"""
+    payload = verify_token(token)
+    if payload is None or payload.get("user_id") is None or payload.get("app_id") != app.id:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials"
+        )
+    user = db.query(User).filter(User.id == payload["user_id"]).first()
+    if user is None or user.is_banned:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found or banned"
+        )
+    return user, AuthResponse(
+        success=True,
+        message="Token is valid",
+        token=token,
+        expiry=datetime.utcfromtimestamp(payload["exp"])
+    )
+
+
+def section_error(e: HTTPException) -> dict:
+    error = {"success": False, "status": e.status_code, "message": e.detail}
+    if e.headers and "Retry-After" in e.headers:
+        error["retry_after"] = int(e.headers["Retry-After"])
+    return error
+
+
+@router.post("/bootstrap")
+async def bootstrap(
+    request: BootstrapRequest,
+    client_request: Request,
+    db: Session = Depends(get_db)
+):
+    """Init, authentication, validation, variables and file list in one round trip.
+
+    The app secret is resolved once; a bad secret fails the whole request with
+    404. Every other section reports its own success or error, so a launcher
+    can, for example, show the update prompt and still read the variables.
+    """
+    app = get_app_by_secret(db, request.app_secret)
+    response = {"init": version_check(app, request.version), "auth": None, "validate": None}
+
+    user = None
+    try:
+        if request.token:
+            user, auth = token_login(db, app, request.token)
+        elif request.license_key:
+            user, auth = license_key_login(db, app, LicenseLoginRequest(
+                license_key=request.license_key, hwid=request.hwid, app_secret=request.app_secret
+            ), client_request)
+        elif request.username and request.password is not None:
+            check_login_throttle(request.app_secret, request.username, client_request.client.host)
+            user, auth = password_login(db, app, LoginRequest(
+                username=request.username, password=request.password, hwid=request.hwid, app_secret=request.app_secret
+            ), client_request)
+        else:
+            auth = None
+        response["auth"] = auth.model_dump() if auth else None
+    except HTTPException as e:
+        response["auth"] = section_error(e)
+
+    if user is not None:
+        try:
+            check_subscription(user)
+            response["validate"] = {"valid": True, "message": "Token is valid"}
+        except HTTPException as e:
+            response["validate"] = {"valid": False, "status": e.status_code, "message": e.detail}
+
+    if request.include_vars:
+        response["vars"] = {"success": True, "variables": list_variables(db, app)}
+    if request.include_files:
+        response["files"] = {"success": True, "files": list_files(db, app)}
+
+    response["success"] = (
+        response["init"]["success"]
+        and (response["auth"] is None or response["auth"]["success"])
+        and (response["validate"] is None or response["validate"]["valid"])
+    )
+    return response
+
+
 @router.get("/files/download/{file_id}")
 async def download_file_client(
     file_id: int,
     secret: str,
     db: Session = Depends(get_db)
 ):
-    from fastapi.responses import FileResponse as FastAPIFileResponse
     app = get_app_by_secret(db, secret)
     file_obj = db.query(File).filter(
         File.id == file_id,
@@ -362,7 +522,6 @@ async def download_file_client(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="File not found"
         )
-    import os
     if not os.path.exists(file_obj.file_path):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -382,7 +541,6 @@ async def get_logs(
     db: Session = Depends(get_db)
 ):
     app = get_app_by_secret(db, app_secret)
-    from models.log import Log
     logs = db.query(Log).filter(Log.app_id == app.id).order_by(Log.created_at.desc()).limit(limit).all()
     return [
         {
@@ -1,11 +1,16 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from database import get_db
 from middleware.auth import get_current_admin
 from controllers.app_controller import (
-    create_app, get_apps_by_admin, update_app, delete_app
+    create_app, get_apps_by_admin, update_app
 )
 from schemas.app import AppCreate, AppUpdate, AppResponse
+from models.app import App
+from models.user import User
+from utils.presence import presence
+from utils.deletion_jobs import deletion_jobs
 
 router = APIRouter()
 
@@ -36,7 +41,6 @@ async def update_application(
 ):
     app = update_app(db, app_id, app_data, current_admin.id)
     if not app:
-        from fastapi import HTTPException, status
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Application not found"
@@ -50,12 +54,56 @@ async def delete_application(
     current_admin = Depends(get_current_admin),
     db: Session = Depends(get_db)
 ):
-    success = delete_app(db, app_id, current_admin.id)
-    if not success:
-        from fastapi import HTTPException, status
+    if not db.query(App.id).filter(App.id == app_id, App.admin_id == current_admin.id).first():
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Application not found"
         )
-    return {"success": True, "message": "Application deleted"}
+    # Users, licenses, logs and files are removed in chunks by a background job
+    job = deletion_jobs.submit("app", app_id, app_id, current_admin.id)
+    if not await deletion_jobs.wait(job):
+        return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content={
+            "success": True, "message": "Application deletion started", "job_id": job.id
+        })
+    if job.status == "failed":
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=job.error)
+    return {"success": True, "message": "Application deleted", "job_id": job.id}
 
+
+@router.get("/online")
+async def get_online_counts(
+    current_admin = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """Live online session counts for every app of the admin"""
+    apps = db.query(App.id, App.name).filter(App.admin_id == current_admin.id).all()
+    counts = [{"app_id": app.id, "name": app.name, "online": presence.count(app.id)} for app in apps]
+    return {"total": sum(c["online"] for c in counts), "apps": counts}
+
+
+@router.get("/{app_id}/online")
+async def get_online_users(
+    app_id: int,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    current_admin = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """One page of online users; pages are unordered and shift as sessions come and go"""
+    if not db.query(App.id).filter(App.id == app_id, App.admin_id == current_admin.id).first():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Application not found"
+        )
+    page = presence.page(app_id, offset, limit)
+    usernames = dict(
+        db.query(User.id, User.username).filter(User.id.in_([user_id for user_id, _ in page])).all()
+    ) if page else {}
+    return {
+        "online": presence.count(app_id),
+        "offset": offset,
+        "users": [
+            {"user_id": user_id, "username": usernames.get(user_id), "seconds_since_heartbeat": round(idle, 1)}
+            for user_id, idle in page
+        ]
+    }
@@ -1,29 +1,33 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File as FastAPIFile
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File as FastAPIFile, Query
 from sqlalchemy.orm import Session
 from database import get_db
 from middleware.auth import get_current_reseller
 from controllers.ticket_controller import (
-    create_ticket, get_tickets, get_ticket_by_id, update_ticket,
-    add_message_to_ticket, add_attachment_to_message
+    create_ticket, get_ticket_summaries, get_reseller_ticket, update_ticket,
+    add_message_to_ticket, add_attachment_to_message, ticket_exists,
+    get_ticket_messages, mark_ticket_read
 )
 from controllers.reseller_controller import (
-    get_reseller_by_id, get_credit_transactions, get_reseller_applications
+    get_reseller_by_id, get_credit_transactions, get_reseller_applications,
+    purchase_licenses
 )
 from schemas.ticket import (
     TicketCreate, TicketUpdate, TicketResponse, TicketMessageCreate,
-    TicketMessageResponse, TicketAttachmentCreate, TicketAttachmentResponse
+    TicketMessageResponse, TicketAttachmentCreate, TicketAttachmentResponse,
+    TicketSummaryResponse, TicketMessagePage, TicketSearchPage
 )
+from controllers.ticket_search_controller import search_tickets
 from schemas.reseller import CreditTransactionResponse
-from schemas.license import LicenseCreate
+from schemas.license import LicenseCreate, ResellerLicenseBatch
 from models.reseller import Reseller, ResellerApplication
 from models.license import License
 from models.app import App
+from models.ticket import TicketAttachment, TicketMessage
 import os
 import uuid
 from pathlib import Path
-from datetime import datetime, timedelta
-from utils.license_generator import generate_license_key
-from decimal import Decimal
+from routes.websocket import manager, ticket_created_event
+from routes.tickets import search_page
 from fastapi.responses import FileResponse
 
 router = APIRouter()
@@ -38,16 +42,18 @@ async def get_profile(
     current_reseller: Reseller = Depends(get_current_reseller),
     db: Session = Depends(get_db)
 ):
+    # The auth dependency returns a cached snapshot; the profile and balance are always read fresh
+    reseller = get_reseller_by_id(db, current_reseller.id)
     return {
-        "id": current_reseller.id,
-        "username": current_reseller.username,
-        "email": current_reseller.email,
-        "company_name": current_reseller.company_name,
-        "contact_person": current_reseller.contact_person,
-        "phone": current_reseller.phone,
-        "credits": float(current_reseller.credits),
-        "is_verified": current_reseller.is_verified,
-        "created_at": current_reseller.created_at
+        "id": reseller.id,
+        "username": reseller.username,
+        "email": reseller.email,
+        "company_name": reseller.company_name,
+        "contact_person": reseller.contact_person,
+        "phone": reseller.phone,
+        "credits": float(reseller.credits),
+        "is_verified": reseller.is_verified,
+        "created_at": reseller.created_at
     }
 
 
@@ -67,30 +73,40 @@ async def create_ticket_endpoint(
 ):
     try:
         ticket = create_ticket(db, ticket_data, current_reseller.id)
-        # Filter out internal notes from messages for resellers (should be none for new tickets)
-        if hasattr(ticket, 'messages') and ticket.messages:
-            filtered = [msg for msg in ticket.messages if not getattr(msg, 'is_internal_note', False)]
-            object.__setattr__(ticket, 'messages', filtered)
-        return ticket
+        await manager.broadcast_to_admins(ticket_created_event(ticket))
+        return get_reseller_ticket(db, ticket.id, current_reseller.id)
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
-@router.get("/tickets", response_model=list[TicketResponse])
+@router.get("/tickets", response_model=list[TicketSummaryResponse])
 async def list_my_tickets(
     status: str = None,
     current_reseller: Reseller = Depends(get_current_reseller),
     db: Session = Depends(get_db)
 ):
-    tickets = get_tickets(db, reseller_id=current_reseller.id, status=status)
-    # Filter out internal notes from messages for resellers
-    # We need to do this before Pydantic serialization
-    for ticket in tickets:
-        if hasattr(ticket, 'messages') and ticket.messages:
-            # Create a filtered list and replace the relationship temporarily
-            filtered = [msg for msg in ticket.messages if not getattr(msg, 'is_internal_note', False)]
-            object.__setattr__(ticket, 'messages', filtered)
-    return tickets
+    # Internal notes are excluded from counts and previews for reseller viewers
+    return get_ticket_summaries(
+        db, "reseller", current_reseller.id,
+        reseller_id=current_reseller.id, status=status
+    )
+
+
+@router.get("/tickets/search", response_model=TicketSearchPage)
+async def search_my_tickets(
+    q: str = Query(..., min_length=1),
+    status: str = None,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    current_reseller: Reseller = Depends(get_current_reseller),
+    db: Session = Depends(get_db)
+):
+    # Internal notes are never searchable by resellers
+    hits = search_tickets(
+        db, q, reseller_id=current_reseller.id, status=status,
+        include_internal=False, limit=limit, offset=offset
+    )
+    return search_page(hits, limit, offset)
 
 
 @router.get("/tickets/{ticket_id}", response_model=TicketResponse)
@@ -99,14 +115,26 @@ async def get_ticket(
     current_reseller: Reseller = Depends(get_current_reseller),
     db: Session = Depends(get_db)
 ):
-    ticket = get_ticket_by_id(db, ticket_id, reseller_id=current_reseller.id)
-    if not ticket:
+    if not ticket_exists(db, ticket_id, reseller_id=current_reseller.id):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ticket not found")
-    # Filter out internal notes from messages for resellers
-    if hasattr(ticket, 'messages') and ticket.messages:
-        filtered = [msg for msg in ticket.messages if not getattr(msg, 'is_internal_note', False)]
-        object.__setattr__(ticket, 'messages', filtered)
-    return ticket
+    # Commit the read marker before loading so the thread is not expired by the commit
+    mark_ticket_read(db, ticket_id, "reseller", current_reseller.id)
+    return get_reseller_ticket(db, ticket_id, current_reseller.id)
+
+
+@router.get("/tickets/{ticket_id}/messages", response_model=TicketMessagePage)
+async def list_messages(
+    ticket_id: int,
+    before: int = None,
+    limit: int = Query(50, ge=1, le=200),
+    current_reseller: Reseller = Depends(get_current_reseller),
+    db: Session = Depends(get_db)
+):
+    if not ticket_exists(db, ticket_id, reseller_id=current_reseller.id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ticket not found")
+    if before is None:
+        mark_ticket_read(db, ticket_id, "reseller", current_reseller.id)
+    return get_ticket_messages(db, ticket_id, before=before, limit=limit, include_internal=False)
 
 
 @router.post("/tickets/{ticket_id}/messages", response_model=TicketMessageResponse)
@@ -117,10 +145,12 @@ async def add_message(
     db: Session = Depends(get_db)
 ):
     # Verify ticket belongs to reseller
-    ticket = get_ticket_by_id(db, ticket_id, reseller_id=current_reseller.id)
-    if not ticket:
+    if not ticket_exists(db, ticket_id, reseller_id=current_reseller.id):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ticket not found")
     
+    # Resellers cannot write internal notes
+    message_data.is_internal_note = False
+    
     try:
         message = add_message_to_ticket(
             db, ticket_id, message_data, 
@@ -129,8 +159,6 @@ async def add_message(
         )
         
         # Notify WebSocket connections about new message
-        from routes.websocket import manager
-        from schemas.ticket import TicketMessageResponse
         message_response = TicketMessageResponse(
             id=message.id,
             sender_type=message.sender_type,
@@ -162,11 +190,9 @@ async def upload_attachment(
     db: Session = Depends(get_db)
 ):
     # Verify ticket belongs to reseller
-    ticket = get_ticket_by_id(db, ticket_id, reseller_id=current_reseller.id)
-    if not ticket:
+    if not ticket_exists(db, ticket_id, reseller_id=current_reseller.id):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ticket not found")
     
-    from models.ticket import TicketMessage
     message = db.query(TicketMessage).filter(
         TicketMessage.id == message_id,
         TicketMessage.ticket_id == ticket_id,
@@ -219,18 +245,14 @@ async def get_my_applications(
     return get_reseller_applications(db, current_reseller.id)
 
 
-@router.post("/licenses/generate")
-async def generate_license(
-    app_id: int,
-    duration_days: int,
-    username: str = None,
-    hwid: str = None,
-    current_reseller: Reseller = Depends(get_current_reseller),
-    db: Session = Depends(get_db)
-):
+# Largest batch accepted by /licenses/generate/bulk
+MAX_LICENSE_BATCH = int(os.getenv("MAX_LICENSE_BATCH", "1000"))
+
+
+def get_purchasable_app(db: Session, reseller_id: int, app_id: int) -> App:
     # Verify reseller has access to this app
     assignment = db.query(ResellerApplication).filter(
-        ResellerApplication.reseller_id == current_reseller.id,
+        ResellerApplication.reseller_id == reseller_id,
         ResellerApplication.app_id == app_id,
         ResellerApplication.is_active == True
     ).first()
@@ -240,60 +262,98 @@ async def generate_license(
             detail="You don't have access to this application"
         )
     
-    # Get app details
     app = db.query(App).filter(App.id == app_id).first()
     if not app:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Application not found")
+    return app
+
+
+@router.post("/licenses/generate")
+async def generate_license(
+    app_id: int,
+    duration_days: int = Query(..., ge=1),
+    username: str = None,
+    hwid: str = None,
+    current_reseller: Reseller = Depends(get_current_reseller),
+    db: Session = Depends(get_db)
+):
+    app = get_purchasable_app(db, current_reseller.id, app_id)
+    
+    # Credits are deducted atomically; fails instead of overdrawing when purchases race
+    try:
+        transaction, licenses = purchase_licenses(
+            db, current_reseller.id, app, duration_days, [{"username": username, "hwid": hwid}]
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    license = licenses[0]
     
-    # Calculate credit cost (e.g., $1 per day)
-    credit_cost = Decimal(str(duration_days))
+    await manager.send_to_user("reseller", current_reseller.id, {
+        "type": "credits_changed",
+        "amount": transaction.amount,
+        "balance": transaction.balance_after
+    })
     
-    if current_reseller.credits < credit_cost:
+    return {
+        "license_key": license.key,
+        "app_name": app.name,
+        "username": username,
+        "expires_at": license.expires_at,
+        "duration_days": duration_days,
+        "cost": float(-transaction.amount),
+        "remaining_credits": float(transaction.balance_after)
+    }
+
+
+@router.post("/licenses/generate/bulk")
+async def generate_licenses_bulk(
+    batch: ResellerLicenseBatch,
+    current_reseller: Reseller = Depends(get_current_reseller),
+    db: Session = Depends(get_db)
+):
+    if batch.duration_days < 1:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="duration_days must be at least 1")
+    if (batch.count is None) == (batch.items is None):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Provide either count or items")
+    if batch.items is not None:
+        items = [item.model_dump() for item in batch.items]
+    else:
+        items = [{} for _ in range(batch.count)]
+    if not 1 <= len(items) <= MAX_LICENSE_BATCH:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Insufficient credits. Required: ${credit_cost}, Available: ${current_reseller.credits}"
+            detail=f"A batch must contain between 1 and {MAX_LICENSE_BATCH} licenses"
         )
     
-    # Deduct credits
-    from models.reseller import CreditTransaction
-    current_reseller.credits -= credit_cost
-    new_balance = current_reseller.credits
-    
-    # Create transaction record
-    transaction = CreditTransaction(
-        reseller_id=current_reseller.id,
-        amount=-credit_cost,
-        balance_after=new_balance,
-        transaction_type="usage",
-        description=f"License generated for {app.name} ({duration_days} days)"
-    )
-    db.add(transaction)
+    app = get_purchasable_app(db, current_reseller.id, batch.app_id)
     
-    # Generate license
-    license_key = generate_license_key()
-    expiry_date = datetime.utcnow() + timedelta(days=duration_days)
+    try:
+        transaction, licenses = purchase_licenses(db, current_reseller.id, app, batch.duration_days, items)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     
-    license = License(
-        key=license_key,
-        app_id=app_id,
-        username=username,
-        hwid=hwid,
-        expires_at=expiry_date,
-        is_active=True,
-        created_by_reseller_id=current_reseller.id
-    )
-    db.add(license)
-    db.commit()
-    db.refresh(license)
+    await manager.send_to_user("reseller", current_reseller.id, {
+        "type": "credits_changed",
+        "amount": transaction.amount,
+        "balance": transaction.balance_after
+    })
     
     return {
-        "license_key": license_key,
+        "transaction_id": transaction.id,
         "app_name": app.name,
-        "username": username,
-        "expires_at": expiry_date,
-        "duration_days": duration_days,
-        "cost": float(credit_cost),
-        "remaining_credits": float(new_balance)
+        "duration_days": batch.duration_days,
+        "count": len(licenses),
+        "cost": float(-transaction.amount),
+        "remaining_credits": float(transaction.balance_after),
+        "licenses": [
+            {
+                "license_key": license.key,
+                "username": license.username,
+                "hwid": license.hwid,
+                "expires_at": license.expires_at
+            }
+            for license in licenses
+        ]
     }
 
 
@@ -303,27 +363,28 @@ async def get_my_licenses(
     current_reseller: Reseller = Depends(get_current_reseller),
     db: Session = Depends(get_db)
 ):
-    query = db.query(License).filter(License.created_by_reseller_id == current_reseller.id)
+    # App names come from the same query instead of one lookup per license
+    query = db.query(License, App.name).outerjoin(App, App.id == License.app_id).filter(
+        License.created_by_reseller_id == current_reseller.id
+    )
     if app_id:
         query = query.filter(License.app_id == app_id)
     
-    licenses = query.order_by(License.created_at.desc()).limit(100).all()
+    rows = query.order_by(License.created_at.desc()).limit(100).all()
     
-    result = []
-    for lic in licenses:
-        app = db.query(App).filter(App.id == lic.app_id).first()
-        result.append({
+    return [
+        {
             "id": lic.id,
             "key": lic.key,
-            "app_name": app.name if app else "Unknown",
+            "app_name": app_name or "Unknown",
             "username": lic.username,
             "hwid": lic.hwid,
             "expires_at": lic.expires_at,
             "is_active": lic.is_active,
             "created_at": lic.created_at
-        })
-    
-    return result
+        }
+        for lic, app_name in rows
+    ]
 
 
 @router.get("/tickets/{ticket_id}/attachments/{attachment_id}/download")
@@ -333,16 +394,14 @@ async def download_attachment(
     current_reseller: Reseller = Depends(get_current_reseller),
     db: Session = Depends(get_db)
 ):
-    from models.ticket import TicketAttachment, TicketMessage
-    
     # Verify ticket belongs to reseller
-    ticket = get_ticket_by_id(db, ticket_id, reseller_id=current_reseller.id)
-    if not ticket:
+    if not ticket_exists(db, ticket_id, reseller_id=current_reseller.id):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ticket not found")
     
     attachment = db.query(TicketAttachment).join(TicketMessage).filter(
         TicketAttachment.id == attachment_id,
-        TicketMessage.ticket_id == ticket_id
+        TicketMessage.ticket_id == ticket_id,
+        TicketMessage.is_internal_note == False
     ).first()
     
     if not attachment:
@@ -13,6 +13,7 @@ from schemas.reseller import (
     CreditAssignRequest, CreditTransactionResponse, ResellerAppAssignment
 )
 from models.admin import Admin
+from routes.websocket import manager
 
 router = APIRouter()
 
@@ -71,9 +72,15 @@ async def assign_credits_endpoint(
 ):
     credit_data.reseller_id = reseller_id
     try:
-        return assign_credits(db, credit_data, current_admin.id)
+        transaction = assign_credits(db, credit_data, current_admin.id)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    await manager.send_to_user("reseller", reseller_id, {
+        "type": "credits_changed",
+        "amount": transaction.amount,
+        "balance": transaction.balance_after
+    })
+    return transaction
 
 
 @router.get("/{reseller_id}/transactions", response_model=list[CreditTransactionResponse])
@@ -92,9 +99,16 @@ async def approve_topup(
     db: Session = Depends(get_db)
 ):
     try:
-        return approve_topup_request(db, ticket_id, current_admin.id)
+        transaction = approve_topup_request(db, ticket_id, current_admin.id)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    await manager.send_to_user("reseller", transaction.reseller_id, {
+        "type": "topup_approved",
+        "ticket_id": ticket_id,
+        "amount": transaction.amount,
+        "balance": transaction.balance_after
+    })
+    return transaction
 
 
 @router.delete("/{reseller_id}")
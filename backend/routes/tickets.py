@@ -1,24 +1,50 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File as FastAPIFile
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File as FastAPIFile, Query
 from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
 from database import get_db
 from middleware.auth import get_current_admin
 from controllers.ticket_controller import (
-    create_ticket, get_tickets, get_ticket_by_id, update_ticket,
-    add_message_to_ticket, add_attachment_to_message
+    create_ticket, get_ticket_summaries, get_ticket_by_id, update_ticket,
+    add_message_to_ticket, add_attachment_to_message, ticket_exists,
+    get_ticket_messages, mark_ticket_read
 )
 from schemas.ticket import (
     TicketCreate, TicketUpdate, TicketResponse, TicketMessageCreate,
-    TicketMessageResponse, TicketAttachmentCreate, TicketAttachmentResponse
+    TicketMessageResponse, TicketAttachmentCreate, TicketAttachmentResponse,
+    TicketSummaryResponse, TicketMessagePage, TicketSearchPage
 )
+from controllers.ticket_search_controller import search_tickets
 from models.admin import Admin
-from models.ticket import TicketAttachment
+from models.ticket import TicketAttachment, TicketMessage
+from routes.websocket import manager, ticket_created_event
 import os
 import uuid
 from pathlib import Path
 
 router = APIRouter()
 
+
+def search_page(hits, limit: int, offset: int) -> dict:
+    return {
+        "results": [
+            {
+                "ticket_id": ticket.id,
+                "title": ticket.title,
+                "status": ticket.status,
+                "priority": ticket.priority,
+                "ticket_type": ticket.ticket_type,
+                "reseller_id": ticket.reseller_id,
+                "created_at": ticket.created_at,
+                "updated_at": ticket.updated_at,
+                "score": score or 0.0,
+                "snippet": snippet,
+                "message_id": message_id
+            }
+            for ticket, score, snippet, message_id in hits
+        ],
+        "next_offset": offset + limit if len(hits) == limit else None
+    }
+
 # Create uploads directory if it doesn't exist
 UPLOAD_DIR = Path("uploads/tickets")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
@@ -33,19 +59,35 @@ async def create_ticket_endpoint(
 ):
     # Admin can create tickets on behalf of resellers
     try:
-        return create_ticket(db, ticket_data, reseller_id)
+        ticket = create_ticket(db, ticket_data, reseller_id)
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    await manager.send_to_user("reseller", reseller_id, ticket_created_event(ticket))
+    return ticket
 
 
-@router.get("/", response_model=list[TicketResponse])
+@router.get("/", response_model=list[TicketSummaryResponse])
 async def list_tickets(
     status: str = None,
     reseller_id: int = None,
     current_admin: Admin = Depends(get_current_admin),
     db: Session = Depends(get_db)
 ):
-    return get_tickets(db, reseller_id=reseller_id, status=status)
+    return get_ticket_summaries(db, "admin", current_admin.id, reseller_id=reseller_id, status=status)
+
+
+@router.get("/search", response_model=TicketSearchPage)
+async def search(
+    q: str = Query(..., min_length=1),
+    status: str = None,
+    reseller_id: int = None,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    current_admin: Admin = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    hits = search_tickets(db, q, reseller_id=reseller_id, status=status, limit=limit, offset=offset)
+    return search_page(hits, limit, offset)
 
 
 @router.get("/{ticket_id}", response_model=TicketResponse)
@@ -54,10 +96,26 @@ async def get_ticket(
     current_admin: Admin = Depends(get_current_admin),
     db: Session = Depends(get_db)
 ):
-    ticket = get_ticket_by_id(db, ticket_id)
-    if not ticket:
+    if not ticket_exists(db, ticket_id):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ticket not found")
-    return ticket
+    # Commit the read marker before loading so the thread is not expired by the commit
+    mark_ticket_read(db, ticket_id, "admin", current_admin.id)
+    return get_ticket_by_id(db, ticket_id)
+
+
+@router.get("/{ticket_id}/messages", response_model=TicketMessagePage)
+async def list_messages(
+    ticket_id: int,
+    before: int = None,
+    limit: int = Query(50, ge=1, le=200),
+    current_admin: Admin = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    if not ticket_exists(db, ticket_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ticket not found")
+    if before is None:
+        mark_ticket_read(db, ticket_id, "admin", current_admin.id)
+    return get_ticket_messages(db, ticket_id, before=before, limit=limit)
 
 
 @router.put("/{ticket_id}", response_model=TicketResponse)
@@ -88,9 +146,7 @@ async def add_message(
         )
         
         # Notify WebSocket connections about new message
-        from routes.websocket import manager
-        from schemas.ticket import TicketMessageResponse as TicketMessageResponseSchema
-        message_response = TicketMessageResponseSchema(
+        message_response = TicketMessageResponse(
             id=message.id,
             sender_type=message.sender_type,
             sender_id=message.sender_id,
@@ -103,7 +159,7 @@ async def add_message(
             "type": "new_message",
             "ticket_id": ticket_id,
             "message": message_response.dict()
-        })
+        }, admins_only=message.is_internal_note)
         
         return message
     except ValueError as e:
@@ -125,7 +181,6 @@ async def upload_attachment(
     if not ticket:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ticket not found")
     
-    from models.ticket import TicketMessage
     message = db.query(TicketMessage).filter(
         TicketMessage.id == message_id,
         TicketMessage.ticket_id == ticket_id
@@ -189,7 +244,6 @@ async def download_attachment(
     current_admin: Admin = Depends(get_current_admin),
     db: Session = Depends(get_db)
 ):
-    from models.ticket import TicketMessage
     attachment = db.query(TicketAttachment).join(TicketMessage).filter(TicketAttachment.id == attachment_id).first()
     if not attachment:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Attachment not found")
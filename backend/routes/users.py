@@ -1,10 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from database import get_db
 from middleware.auth import get_current_admin
 from models.user import User
 from models.app import App
-from schemas.user import UserResponse, BanRequest, UnbanRequest
+from schemas.user import UserResponse, BanRequest, UnbanRequest, BulkUserFilter, BulkBanRequest
+from controllers.user_controller import (
+    bulk_user_conditions, count_bulk_users, bulk_ban_users, bulk_unban_users, bulk_delete_users
+)
+from utils.webhook import send_webhook
+from utils.presence import presence
+from security.principal_cache import principal_cache
+from utils.deletion_jobs import deletion_jobs
+import asyncio
 
 router = APIRouter()
 
@@ -24,6 +33,78 @@ async def get_users(
     return query.all()
 
 
+def drop_session(app_id: int, user_id: int):
+    """Take a banned or deleted user offline and make the heartbeat re-check them"""
+    presence.remove(app_id, user_id)
+    principal_cache.invalidate("user", user_id)
+
+
+def run_bulk(db: Session, admin_id: int, criteria: BulkUserFilter, operation):
+    """Dry-run count or chunked execution of a bulk operation; returns (response, changed users per app)"""
+    try:
+        conditions = bulk_user_conditions(admin_id, criteria)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if criteria.dry_run:
+        by_app = count_bulk_users(db, conditions)
+        return {"success": True, "dry_run": True, "matched": sum(by_app.values()), "by_app": by_app}, {}
+    changed = operation(db, conditions)
+    by_app = {app_id: len(users) for app_id, users in changed.items()}
+    return {"success": True, "dry_run": False, "affected": sum(by_app.values()), "by_app": by_app}, changed
+
+
+@router.post("/bulk/ban")
+async def bulk_ban(
+    request: BulkBanRequest,
+    current_admin = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    response, banned = run_bulk(
+        db, current_admin.id, request, lambda db, conditions: bulk_ban_users(db, conditions, request.reason)
+    )
+    if banned:
+        webhooks = dict(db.query(App.id, App.webhook_url).filter(
+            App.id.in_(banned), App.webhook_url.isnot(None)
+        ).all())
+        for app_id, users in banned.items():
+            for user_id, _ in users:
+                drop_session(app_id, user_id)
+            if app_id in webhooks:
+                # One event per app instead of one per user
+                asyncio.create_task(send_webhook(webhooks[app_id], "bulk_ban", {
+                    "count": len(users),
+                    "users": [{"user_id": user_id, "username": username} for user_id, username in users],
+                    "reason": request.reason
+                }))
+    return response
+
+
+@router.post("/bulk/unban")
+async def bulk_unban(
+    request: BulkUserFilter,
+    current_admin = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    response, unbanned = run_bulk(db, current_admin.id, request, bulk_unban_users)
+    for users in unbanned.values():
+        for user_id, _ in users:
+            principal_cache.invalidate("user", user_id)
+    return response
+
+
+@router.post("/bulk/delete")
+async def bulk_delete(
+    request: BulkUserFilter,
+    current_admin = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    response, deleted = run_bulk(db, current_admin.id, request, bulk_delete_users)
+    for app_id, users in deleted.items():
+        for user_id, _ in users:
+            drop_session(app_id, user_id)
+    return response
+
+
 @router.get("/{user_id}", response_model=UserResponse)
 async def get_user(
     user_id: int,
@@ -60,10 +141,9 @@ async def ban_user(
     user.is_banned = True
     user.ban_reason = request.reason
     db.commit()
+    drop_session(user.app_id, user.id)
     
     if user.app.webhook_url:
-        from utils.webhook import send_webhook
-        import asyncio
         asyncio.create_task(send_webhook(user.app.webhook_url, "ban", {
             "user_id": user.id,
             "username": user.username,
@@ -91,6 +171,7 @@ async def unban_user(
     user.is_banned = False
     user.ban_reason = None
     db.commit()
+    principal_cache.invalidate("user", user.id)
     return {"success": True, "message": "User unbanned"}
 
 
@@ -109,7 +190,14 @@ async def delete_user(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
-    db.delete(user)
-    db.commit()
-    return {"success": True, "message": "User deleted"}
+    drop_session(user.app_id, user.id)
+    # Licenses and logs are removed in chunks by a background job
+    job = deletion_jobs.submit("user", user.id, user.app_id, current_admin.id)
+    if not await deletion_jobs.wait(job):
+        return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content={
+            "success": True, "message": "User deletion started", "job_id": job.id
+        })
+    if job.status == "failed":
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=job.error)
+    return {"success": True, "message": "User deleted", "job_id": job.id}
 
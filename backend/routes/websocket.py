@@ -1,80 +1,260 @@
 from fastapi import WebSocket, WebSocketDisconnect, Depends, HTTPException, status, Query
 from fastapi.routing import APIRouter
+from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
-from database import SessionLocal
+from database import SessionLocal, engine
 from security.jwt import verify_token
+from security.principal_cache import principal_cache
 from models.reseller import Reseller
 from models.admin import Admin
 from models.ticket import Ticket, TicketMessage
-from typing import Dict, Set
+from utils.pubsub import PubSub, create_pubsub
+from typing import Dict, Optional, Set
 import json
 import asyncio
+import os
+import uuid
 
 router = APIRouter()
 
+# Maximum number of serialised messages buffered per socket before it is
+# treated as a slow consumer and disconnected
+SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+# Seconds of client silence before the server sends a heartbeat, and before
+# the socket is considered half-open and closed. Clients ping every 30s.
+HEARTBEAT_INTERVAL = float(os.getenv("WS_HEARTBEAT_INTERVAL", "30"))
+IDLE_TIMEOUT = float(os.getenv("WS_IDLE_TIMEOUT", "90"))
+
+
+class ClientConnection:
+    """A single websocket with its own bounded send queue and writer task"""
+
+    def __init__(self, websocket: WebSocket, user_id: str, stream: bool = False, queue_size: int = SEND_QUEUE_SIZE):
+        self.websocket = websocket
+        self.user_id = user_id
+        # Multiplexed /ws/stream sockets also receive account-level events
+        self.stream = stream
+        self.tickets: Set[int] = set()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.writer_task: Optional[asyncio.Task] = None
+
+    def enqueue(self, text: str) -> bool:
+        try:
+            self.queue.put_nowait(text)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+
+def serialize_message(message: dict) -> str:
+    return json.dumps(jsonable_encoder(message))
+
+
 # Store active connections
 class ConnectionManager:
-    def __init__(self):
+    """Tracks this worker's sockets; events reach other workers through the pub/sub bus"""
+
+    def __init__(self, bus: Optional[PubSub] = None):
+        self.bus = bus or create_pubsub()
+        self.worker_id = uuid.uuid4().hex
         # ticket_id -> Set[WebSocket]
         self.ticket_connections: Dict[int, Set[WebSocket]] = {}
         # user_id -> Set[WebSocket] for tracking user connections
         self.user_connections: Dict[str, Set[WebSocket]] = {}
+        # WebSocket -> ClientConnection holding its send queue
+        self.clients: Dict[WebSocket, ClientConnection] = {}
+        # DB sessions currently opened by WebSocket handlers
+        self.db_sessions_held = 0
         
-    async def connect(self, websocket: WebSocket, ticket_id: int, user_id: str):
+    def gauges(self) -> dict:
+        pool = engine.pool
+        return {
+            "open_sockets": len(self.clients),
+            "watched_tickets": len(self.ticket_connections),
+            "connected_users": len(self.user_connections),
+            "ws_db_sessions_held": self.db_sessions_held,
+            "db_pool_checked_out": pool.checkedout() if hasattr(pool, "checkedout") else None
+        }
+    
+    async def start(self):
+        await self.bus.start(self._on_bus_message)
+    
+    async def stop(self):
+        await self.bus.stop()
+    
+    async def connect(self, websocket: WebSocket, ticket_id: Optional[int], user_id: str, stream: bool = False):
         await websocket.accept()
-        if ticket_id not in self.ticket_connections:
-            self.ticket_connections[ticket_id] = set()
-        self.ticket_connections[ticket_id].add(websocket)
+        client = ClientConnection(websocket, user_id, stream=stream)
+        self.clients[websocket] = client
+        self.user_connections.setdefault(user_id, set()).add(websocket)
+        if ticket_id is not None:
+            self.subscribe(websocket, ticket_id)
+        client.writer_task = asyncio.create_task(self._writer(client))
         
-        if user_id not in self.user_connections:
-            self.user_connections[user_id] = set()
-        self.user_connections[user_id].add(websocket)
+    def subscribe(self, websocket: WebSocket, ticket_id: int):
+        client = self.clients.get(websocket)
+        if client is None:
+            return
+        client.tickets.add(ticket_id)
+        self.ticket_connections.setdefault(ticket_id, set()).add(websocket)
         
-    def disconnect(self, websocket: WebSocket, ticket_id: int, user_id: str):
-        if ticket_id in self.ticket_connections:
-            self.ticket_connections[ticket_id].discard(websocket)
-            if not self.ticket_connections[ticket_id]:
+    def unsubscribe(self, websocket: WebSocket, ticket_id: int):
+        client = self.clients.get(websocket)
+        if client is not None:
+            client.tickets.discard(ticket_id)
+        connections = self.ticket_connections.get(ticket_id)
+        if connections is not None:
+            connections.discard(websocket)
+            if not connections:
                 del self.ticket_connections[ticket_id]
-                
-        if user_id in self.user_connections:
-            self.user_connections[user_id].discard(websocket)
-            if not self.user_connections[user_id]:
-                del self.user_connections[user_id]
+        
+    def is_subscribed(self, websocket: WebSocket, ticket_id: int) -> bool:
+        client = self.clients.get(websocket)
+        return client is not None and ticket_id in client.tickets
+        
+    def disconnect(self, websocket: WebSocket):
+        client = self.clients.pop(websocket, None)
+        if client is None:
+            return
+        
+        for ticket_id in client.tickets:
+            connections = self.ticket_connections.get(ticket_id)
+            if connections is not None:
+                connections.discard(websocket)
+                if not connections:
+                    del self.ticket_connections[ticket_id]
+        client.tickets.clear()
+        
+        connections = self.user_connections.get(client.user_id)
+        if connections is not None:
+            connections.discard(websocket)
+            if not connections:
+                del self.user_connections[client.user_id]
+        
+        if client.writer_task and client.writer_task is not asyncio.current_task():
+            client.writer_task.cancel()
+    
+    async def _writer(self, client: ClientConnection):
+        """Drain one socket's queue so a slow peer only delays itself"""
+        try:
+            while True:
+                text = await client.queue.get()
+                await client.websocket.send_text(text)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Error sending message: {e}")
+            self.disconnect(client.websocket)
+            # Close it too, or the receive loop only notices after IDLE_TIMEOUT
+            await self._close(client.websocket, status.WS_1011_INTERNAL_ERROR, "Send failed")
+    
+    async def _close(self, websocket: WebSocket, code: int, reason: str):
+        try:
+            await websocket.close(code=code, reason=reason)
+        except Exception:
+            pass
+    
+    def _enqueue(self, websockets, text: str):
+        for websocket in list(websockets):
+            client = self.clients.get(websocket)
+            if client is None:
+                continue
+            if not client.enqueue(text):
+                self.disconnect(websocket)
+                asyncio.create_task(self._close(websocket, status.WS_1013_TRY_AGAIN_LATER, "Send queue overflow"))
     
     async def send_personal_message(self, message: dict, websocket: WebSocket):
-        await websocket.send_json(message)
-    
-    async def broadcast_to_ticket(self, ticket_id: int, message: dict):
-        if ticket_id in self.ticket_connections:
-            disconnected = set()
-            for connection in self.ticket_connections[ticket_id]:
-                try:
-                    await connection.send_json(message)
-                except Exception as e:
-                    print(f"Error sending message: {e}")
-                    disconnected.add(connection)
-            
-            # Clean up disconnected connections
-            for conn in disconnected:
-                self.ticket_connections[ticket_id].discard(conn)
+        self._enqueue((websocket,), serialize_message(message))
+    
+    def _origin(self, websocket: WebSocket) -> str:
+        return f"{self.worker_id}:{id(websocket)}"
+    
+    async def _publish(self, event: dict):
+        if self.bus.handler is None:
+            # Bus not started (e.g. scripts running without the lifespan)
+            self.deliver_local(event)
+            return
+        await self.bus.publish(json.dumps(event))
+    
+    async def _on_bus_message(self, data: str):
+        self.deliver_local(json.loads(data))
+    
+    def _stream_connections(self, user_ids):
+        for user_id in user_ids:
+            for websocket in self.user_connections.get(user_id, ()):
+                client = self.clients.get(websocket)
+                if client is not None and client.stream:
+                    yield websocket
+    
+    def deliver_local(self, event: dict):
+        """Enqueue an already serialised bus event on the matching sockets of this worker.
+
+        An event targets either a ticket's subscribers, one user's stream sockets, or
+        the stream sockets of every connected admin.
+        """
+        text = event["payload"]
+        if event.get("ticket_id") is not None:
+            connections = self.ticket_connections.get(event["ticket_id"])
+            if not connections:
+                return
+            exclude = event.get("exclude")
+            if exclude:
+                connections = [conn for conn in connections if self._origin(conn) != exclude]
+            if event.get("admins_only"):
+                connections = [
+                    conn for conn in connections
+                    if conn in self.clients and self.clients[conn].user_id.startswith("admin_")
+                ]
+            self._enqueue(connections, text)
+        elif event.get("user_id"):
+            self._enqueue(list(self._stream_connections((event["user_id"],))), text)
+        elif event.get("role") == "admin":
+            admin_ids = [user_id for user_id in self.user_connections if user_id.startswith("admin_")]
+            self._enqueue(list(self._stream_connections(admin_ids)), text)
+    
+    async def broadcast_to_ticket(self, ticket_id: int, message: dict, admins_only: bool = False):
+        """Send to every subscriber of a ticket; admins_only keeps internal notes off reseller sockets"""
+        await self._publish({
+            "ticket_id": ticket_id,
+            "payload": serialize_message(message),
+            "admins_only": admins_only
+        })
     
     async def broadcast_video_call_signal(self, ticket_id: int, signal: dict, sender_ws: WebSocket):
         """Broadcast video call signaling messages to all connections except sender"""
-        if ticket_id in self.ticket_connections:
-            for connection in self.ticket_connections[ticket_id]:
-                if connection != sender_ws:
-                    try:
-                        await connection.send_json({
-                            "type": "video_signal",
-                            "data": signal
-                        })
-                    except Exception as e:
-                        print(f"Error sending video signal: {e}")
+        text = serialize_message({
+            "type": "video_signal",
+            "ticket_id": ticket_id,
+            "data": signal
+        })
+        await self._publish({"ticket_id": ticket_id, "payload": text, "exclude": self._origin(sender_ws)})
+    
+    async def send_to_user(self, user_type: str, user_id: int, message: dict):
+        """Deliver an account-level event to every stream socket of one admin or reseller"""
+        await self._publish({"user_id": f"{user_type}_{user_id}", "payload": serialize_message(message)})
+    
+    async def broadcast_to_admins(self, message: dict):
+        await self._publish({"role": "admin", "payload": serialize_message(message)})
 
 manager = ConnectionManager()
 
 
-async def get_current_user_from_token(token: str, db: Session):
+def ticket_created_event(ticket: Ticket) -> dict:
+    return {
+        "type": "ticket_created",
+        "ticket": {
+            "id": ticket.id,
+            "title": ticket.title,
+            "status": ticket.status,
+            "priority": ticket.priority,
+            "ticket_type": ticket.ticket_type,
+            "reseller_id": ticket.reseller_id,
+            "created_at": ticket.created_at
+        }
+    }
+
+
+def get_current_user_from_token(token: str, db: Session):
     """Verify token and return user info"""
     payload = verify_token(token)
     if not payload:
@@ -84,43 +264,125 @@ async def get_current_user_from_token(token: str, db: Session):
     user_id = payload.get("reseller_id") or payload.get("admin_id")
     
     if user_type == "reseller" and user_id:
-        reseller = db.query(Reseller).filter(Reseller.id == user_id).first()
+        reseller = principal_cache.get(db, Reseller, "reseller", user_id)
         if reseller and reseller.is_active:
             return {"type": "reseller", "id": reseller.id, "username": reseller.username}
     elif user_type == "admin" and user_id:
-        admin = db.query(Admin).filter(Admin.id == user_id).first()
+        admin = principal_cache.get(db, Admin, "admin", user_id)
         if admin and admin.is_active:
             return {"type": "admin", "id": admin.id, "username": admin.username}
     
     return None
 
 
+def check_ticket_access(db: Session, user: dict, ticket_id: int) -> Optional[str]:
+    """Return None if the user may watch the ticket, otherwise the refusal reason"""
+    ticket = db.query(Ticket.reseller_id).filter(Ticket.id == ticket_id).first()
+    if not ticket:
+        return "Ticket not found"
+    if user["type"] == "reseller" and ticket.reseller_id != user["id"]:
+        return "Access denied"
+    return None
+
+
+def authorize_socket(token: str, ticket_id: Optional[int] = None):
+    """Run the auth (and optional ticket-access) checks on a short-lived session.
+
+    Returns (user, None) on success or (None, reason) when the socket must be refused.
+    """
+    db = SessionLocal()
+    manager.db_sessions_held += 1
+    try:
+        user = get_current_user_from_token(token, db)
+        if not user:
+            return None, "Invalid token"
+        if ticket_id is not None:
+            reason = check_ticket_access(db, user, ticket_id)
+            if reason:
+                return None, reason
+        return user, None
+    finally:
+        db.close()
+        manager.db_sessions_held -= 1
+
+
+def authorize_subscription(user: dict, ticket_id: int) -> Optional[str]:
+    db = SessionLocal()
+    manager.db_sessions_held += 1
+    try:
+        return check_ticket_access(db, user, ticket_id)
+    finally:
+        db.close()
+        manager.db_sessions_held -= 1
+
+
+async def receive_with_heartbeat(websocket: WebSocket):
+    """Wait for the next client message, sending heartbeats while the socket is quiet.
+
+    Returns None once nothing has been received for WS_IDLE_TIMEOUT seconds, so
+    half-open sockets whose peer vanished without a close frame get reaped.
+    """
+    idle = 0.0
+    while True:
+        try:
+            return await asyncio.wait_for(websocket.receive_json(), timeout=HEARTBEAT_INTERVAL)
+        except asyncio.TimeoutError:
+            idle += HEARTBEAT_INTERVAL
+            if idle >= IDLE_TIMEOUT:
+                return None
+            await manager.send_personal_message({"type": "heartbeat"}, websocket)
+
+
+async def handle_ticket_message(websocket: WebSocket, ticket_id: int, user: dict, data: dict):
+    """Handle the per-ticket client messages shared by both socket flavours"""
+    if data.get("type") == "video_signal":
+        # Forward WebRTC signaling messages
+        await manager.broadcast_video_call_signal(
+            ticket_id,
+            data.get("data", {}),
+            websocket
+        )
+    
+    elif data.get("type") == "voice_call_request":
+        # Notify other users about voice call request
+        await manager.broadcast_to_ticket(ticket_id, {
+            "type": "voice_call_request",
+            "from": user,
+            "ticket_id": ticket_id
+        })
+    
+    elif data.get("type") == "video_call_request":
+        # Notify other users about video call request
+        await manager.broadcast_to_ticket(ticket_id, {
+            "type": "video_call_request",
+            "from": user,
+            "ticket_id": ticket_id
+        })
+    
+    elif data.get("type") == "voice_call_end" or data.get("type") == "video_call_end":
+        # Notify other users that call ended
+        await manager.broadcast_to_ticket(ticket_id, {
+            "type": data.get("type"),
+            "from": user,
+            "ticket_id": ticket_id
+        })
+
+
 @router.websocket("/ticket/{ticket_id}")
 async def websocket_endpoint(
     websocket: WebSocket,
     ticket_id: int,
     token: str = Query(...)
 ):
-    db = SessionLocal()
+    # The DB session is only held for the access check, never for the life of the socket
+    user, reason = authorize_socket(token, ticket_id)
+    if not user:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=reason)
+        return
+    
+    user_id = f"{user['type']}_{user['id']}"
+    
     try:
-        # Verify token
-        user = await get_current_user_from_token(token, db)
-        if not user:
-            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
-            return
-        
-        # Verify user has access to this ticket
-        ticket = db.query(Ticket).filter(Ticket.id == ticket_id).first()
-        if not ticket:
-            await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Ticket not found")
-            return
-        
-        if user["type"] == "reseller" and ticket.reseller_id != user["id"]:
-            await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Access denied")
-            return
-        
-        user_id = f"{user['type']}_{user['id']}"
-        
         # Connect
         await manager.connect(websocket, ticket_id, user_id)
         
@@ -133,48 +395,96 @@ async def websocket_endpoint(
         
         # Keep connection alive and handle messages
         while True:
-            data = await websocket.receive_json()
+            data = await receive_with_heartbeat(websocket)
+            if data is None:
+                await websocket.close(code=status.WS_1001_GOING_AWAY, reason="Idle timeout")
+                break
             
             if data.get("type") == "ping":
                 await manager.send_personal_message({"type": "pong"}, websocket)
+            else:
+                await handle_ticket_message(websocket, ticket_id, user, data)
+                
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print(f"WebSocket error: {e}")
+    finally:
+        manager.disconnect(websocket)
+
+
+@router.websocket("/stream")
+async def stream_endpoint(
+    websocket: WebSocket,
+    token: str = Query(...)
+):
+    """One multiplexed socket per admin/reseller.
+
+    Clients send {"type": "subscribe" | "unsubscribe", "ticket_id": N} to manage
+    the tickets they watch; ticket messages carry a "ticket_id" to say which
+    subscription they belong to. Account-level events (ticket_created,
+    topup_approved, credits_changed) are pushed without a subscription.
+    """
+    user, reason = authorize_socket(token)
+    if not user:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=reason)
+        return
+    
+    user_id = f"{user['type']}_{user['id']}"
+    
+    try:
+        await manager.connect(websocket, None, user_id, stream=True)
+        await manager.send_personal_message({"type": "connected", "user": user}, websocket)
+        
+        while True:
+            data = await receive_with_heartbeat(websocket)
+            if data is None:
+                await websocket.close(code=status.WS_1001_GOING_AWAY, reason="Idle timeout")
+                break
+            
+            message_type = data.get("type")
+            if message_type == "ping":
+                await manager.send_personal_message({"type": "pong"}, websocket)
+                continue
             
-            elif data.get("type") == "video_signal":
-                # Forward WebRTC signaling messages
-                await manager.broadcast_video_call_signal(
-                    ticket_id,
-                    data.get("data", {}),
-                    websocket
-                )
+            try:
+                ticket_id = int(data.get("ticket_id"))
+            except (TypeError, ValueError):
+                await manager.send_personal_message({"type": "error", "detail": "ticket_id required"}, websocket)
+                continue
             
-            elif data.get("type") == "voice_call_request":
-                # Notify other users about voice call request
-                await manager.broadcast_to_ticket(ticket_id, {
-                    "type": "voice_call_request",
-                    "from": user,
-                    "ticket_id": ticket_id
-                })
+            if message_type == "subscribe":
+                if manager.is_subscribed(websocket, ticket_id):
+                    reason = None
+                else:
+                    reason = authorize_subscription(user, ticket_id)
+                if reason:
+                    await manager.send_personal_message({
+                        "type": "error",
+                        "ticket_id": ticket_id,
+                        "detail": reason
+                    }, websocket)
+                else:
+                    manager.subscribe(websocket, ticket_id)
+                    await manager.send_personal_message({"type": "subscribed", "ticket_id": ticket_id}, websocket)
             
-            elif data.get("type") == "video_call_request":
-                # Notify other users about video call request
-                await manager.broadcast_to_ticket(ticket_id, {
-                    "type": "video_call_request",
-                    "from": user,
-                    "ticket_id": ticket_id
-                })
+            elif message_type == "unsubscribe":
+                manager.unsubscribe(websocket, ticket_id)
+                await manager.send_personal_message({"type": "unsubscribed", "ticket_id": ticket_id}, websocket)
             
-            elif data.get("type") == "voice_call_end" or data.get("type") == "video_call_end":
-                # Notify other users that call ended
-                await manager.broadcast_to_ticket(ticket_id, {
-                    "type": data.get("type"),
-                    "from": user,
-                    "ticket_id": ticket_id
-                })
-                
+            elif manager.is_subscribed(websocket, ticket_id):
+                await handle_ticket_message(websocket, ticket_id, user, data)
+            
+            else:
+                await manager.send_personal_message({
+                    "type": "error",
+                    "ticket_id": ticket_id,
+                    "detail": "Not subscribed to this ticket"
+                }, websocket)
+    
     except WebSocketDisconnect:
-        manager.disconnect(websocket, ticket_id, user_id if 'user_id' in locals() else "")
+        pass
     except Exception as e:
         print(f"WebSocket error: {e}")
-        manager.disconnect(websocket, ticket_id, user_id if 'user_id' in locals() else "")
     finally:
-        db.close()
-
+        manager.disconnect(websocket)
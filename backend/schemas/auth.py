@@ -30,6 +30,19 @@ class InitRequest(BaseModel):
     version: str
 
 
+class BootstrapRequest(BaseModel):
+    app_secret: str
+    version: Optional[str] = None
+    # One of: an existing token, a license key, or username and password
+    token: Optional[str] = None
+    license_key: Optional[str] = None
+    username: Optional[str] = None
+    password: Optional[str] = None
+    hwid: Optional[str] = None
+    include_vars: bool = True
+    include_files: bool = True
+
+
 class TokenResponse(BaseModel):
     token: str
     expiry: datetime
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 
@@ -10,6 +10,18 @@ class LicenseCreate(BaseModel):
     count: int = 1
 
 
+class ResellerLicenseItem(BaseModel):
+    username: Optional[str] = None
+    hwid: Optional[str] = None
+
+
+class ResellerLicenseBatch(BaseModel):
+    app_id: int
+    duration_days: int
+    count: Optional[int] = None  # Number of blank keys, or
+    items: Optional[List[ResellerLicenseItem]] = None  # one key per item with its own username/hwid
+
+
 class LicenseResponse(BaseModel):
     id: int
     license_key: str
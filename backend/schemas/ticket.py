@@ -78,3 +78,46 @@ class TicketResponse(BaseModel):
     class Config:
         from_attributes = True
 
+
+class TicketSummaryResponse(BaseModel):
+    id: int
+    title: str
+    description: Optional[str]
+    status: str
+    priority: str
+    ticket_type: str
+    topup_amount: Optional[Decimal]
+    assigned_to_admin_id: Optional[int]
+    created_at: datetime
+    updated_at: datetime
+    resolved_at: Optional[datetime]
+    reseller_id: int
+    message_count: int = 0
+    last_message_preview: Optional[str] = None
+    last_message_at: Optional[datetime] = None
+    last_message_sender_type: Optional[str] = None
+    unread: bool = False
+
+
+class TicketMessagePage(BaseModel):
+    messages: List[TicketMessageResponse] = []
+    next_cursor: Optional[int] = None  # Pass as `before` to fetch older messages
+
+
+class TicketSearchHit(BaseModel):
+    ticket_id: int
+    title: str
+    status: str
+    priority: str
+    ticket_type: str
+    reseller_id: int
+    created_at: datetime
+    updated_at: datetime
+    score: float
+    snippet: Optional[str] = None  # Matched text with <mark> around the hits
+    message_id: Optional[int] = None  # Set when the best match is a message
+
+
+class TicketSearchPage(BaseModel):
+    results: List[TicketSearchHit] = []
+    next_offset: Optional[int] = None
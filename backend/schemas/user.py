@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 
@@ -34,3 +34,17 @@ class BanRequest(BaseModel):
 class UnbanRequest(BaseModel):
     user_id: int
 
+
+class BulkUserFilter(BaseModel):
+    # Users must match every filter given; at least one besides app_id is required
+    app_id: Optional[int] = None
+    user_ids: Optional[List[int]] = None
+    hwid: Optional[str] = None
+    ip_address: Optional[str] = None
+    reseller_id: Optional[int] = None
+    license_batch_id: Optional[int] = None  # Credit transaction of a reseller license purchase
+    dry_run: bool = False
+
+
+class BulkBanRequest(BulkUserFilter):
+    reason: Optional[str] = None
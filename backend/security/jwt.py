@@ -1,11 +1,93 @@
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Callable, Optional
+import hashlib
+import threading
+import time
 import jwt
 import os
 
 SECRET_KEY = os.getenv("JWT_SECRET", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7
+# Verified tokens kept in memory so repeat requests skip HMAC and JSON decoding
+TOKEN_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", "10000"))
+
+
+class TokenCache:
+    """Bounded LRU of verified token payloads, keyed by a SHA-256 digest of the token.
+
+    Entries are dropped at the token's `exp`. Anything that revokes tokens must
+    call discard()/discard_where() so a cached payload is never served after it.
+    """
+
+    def __init__(self, max_size: int = TOKEN_CACHE_SIZE):
+        self.max_size = max_size
+        self.entries: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[dict]:
+        key = self.digest(token)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            payload, expires_at = entry
+            if expires_at <= time.time():
+                del self.entries[key]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+        return dict(payload)
+
+    def put(self, token: str, payload: dict):
+        if self.max_size <= 0 or "exp" not in payload:
+            return
+        with self.lock:
+            self.entries[self.digest(token)] = (dict(payload), float(payload["exp"]))
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, token: str):
+        with self.lock:
+            self.entries.pop(self.digest(token), None)
+
+    def discard_where(self, predicate: Callable[[dict], bool]):
+        """Drop every cached payload matching `predicate`, e.g. all tokens of one admin"""
+        with self.lock:
+            for key in [k for k, (payload, _) in self.entries.items() if predicate(payload)]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+token_cache = TokenCache()
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -20,8 +102,12 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 
 
 def verify_token(token: str):
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        token_cache.put(token, payload)
         return payload
     except jwt.ExpiredSignatureError:
         return None
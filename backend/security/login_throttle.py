@@ -0,0 +1,105 @@
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+
+# Failures (after decay) that trigger a lockout
+LOGIN_LOCKOUT_THRESHOLD = float(os.getenv("LOGIN_LOCKOUT_THRESHOLD", "5"))
+# First lockout length; each further lockout doubles it up to the maximum
+LOGIN_LOCKOUT_BASE_SECONDS = float(os.getenv("LOGIN_LOCKOUT_BASE_SECONDS", "30"))
+LOGIN_LOCKOUT_MAX_SECONDS = float(os.getenv("LOGIN_LOCKOUT_MAX_SECONDS", "3600"))
+# Half-life of a recorded failure
+LOGIN_FAILURE_HALF_LIFE = float(os.getenv("LOGIN_FAILURE_HALF_LIFE", "900"))
+# Upper bound on tracked keys; the least recently touched are evicted first
+LOGIN_TRACKER_MAX_KEYS = int(os.getenv("LOGIN_TRACKER_MAX_KEYS", "100000"))
+
+
+class FailureCounter:
+    """Exponentially decaying failure score plus lockout state for one key"""
+    __slots__ = ("score", "updated", "locked_until", "lockouts", "rejected")
+
+    def __init__(self, now: float):
+        self.score = 0.0
+        self.updated = now
+        self.locked_until = 0.0
+        self.lockouts = 0
+        self.rejected = 0  # Attempts refused during lockouts, reported with the next lockout
+
+    def decay(self, now: float):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.score *= math.pow(0.5, elapsed / LOGIN_FAILURE_HALF_LIFE)
+            self.updated = now
+
+
+class LoginFailureTracker:
+    """In-memory failure counts keyed by (app, username) and (app, IP).
+
+    Keys are checked before any database or bcrypt work, so a locked-out
+    credential-stuffing run costs a dictionary lookup per attempt.
+    """
+
+    def __init__(self, max_keys: int = LOGIN_TRACKER_MAX_KEYS):
+        self.max_keys = max_keys
+        self.counters: "OrderedDict[tuple, FailureCounter]" = OrderedDict()
+
+    @staticmethod
+    def keys(app: str, username: Optional[str], ip: Optional[str]):
+        keys = []
+        if username:
+            keys.append((app, "username", username.lower()))
+        if ip:
+            keys.append((app, "ip", ip))
+        return keys
+
+    def _get(self, key: tuple, now: float, create: bool = False) -> Optional[FailureCounter]:
+        counter = self.counters.get(key)
+        if counter is not None:
+            counter.decay(now)
+            if counter.score < 0.5 and counter.locked_until <= now:
+                # Fully decayed: forget the key and its lockout history
+                del self.counters[key]
+                counter = None
+        if counter is None:
+            if not create:
+                return None
+            counter = self.counters[key] = FailureCounter(now)
+            while len(self.counters) > self.max_keys:
+                self.counters.popitem(last=False)
+        self.counters.move_to_end(key)
+        return counter
+
+    def retry_after(self, app: str, username: Optional[str], ip: Optional[str]) -> int:
+        """Seconds until this attempt may be tried again, or 0 if it is allowed"""
+        now = time.monotonic()
+        wait = 0.0
+        for key in self.keys(app, username, ip):
+            counter = self._get(key, now)
+            if counter and counter.locked_until > now:
+                counter.rejected += 1
+                wait = max(wait, counter.locked_until - now)
+        return math.ceil(wait)
+
+    def record_failure(self, app: str, username: Optional[str], ip: Optional[str]) -> list:
+        """Count a failed attempt; returns a (key, seconds, rejected) tuple for every lockout it starts"""
+        now = time.monotonic()
+        started = []
+        for key in self.keys(app, username, ip):
+            counter = self._get(key, now, create=True)
+            counter.score += 1
+            if round(counter.score) >= LOGIN_LOCKOUT_THRESHOLD and counter.locked_until <= now:
+                seconds = min(LOGIN_LOCKOUT_BASE_SECONDS * 2 ** counter.lockouts, LOGIN_LOCKOUT_MAX_SECONDS)
+                counter.lockouts += 1
+                counter.locked_until = now + seconds
+                started.append((key, int(seconds), counter.rejected))
+                counter.rejected = 0
+        return started
+
+    def record_success(self, app: str, username: Optional[str]):
+        # Only the account is cleared; a shared IP keeps its history
+        for key in self.keys(app, username, None):
+            self.counters.pop(key, None)
+
+
+login_tracker = LoginFailureTracker()
@@ -1,12 +1,19 @@
+import time
 import bcrypt
+from utils.metrics import password_latency
 
 
 def hash_password(password: str) -> str:
+    started = time.perf_counter()
     salt = bcrypt.gensalt()
     hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
+    password_latency.observe(time.perf_counter() - started, "hash")
     return hashed.decode('utf-8')
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
-
+    started = time.perf_counter()
+    try:
+        return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+    finally:
+        password_latency.observe(time.perf_counter() - started, "verify")
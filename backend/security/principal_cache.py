@@ -0,0 +1,103 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from sqlalchemy.orm import Session
+
+# Longest a cached admin/reseller/user snapshot is trusted; bounds how long a
+# deactivation or ban made by another worker can go unnoticed here
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "30"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+
+
+class Principal:
+    """Read-only snapshot of an authenticated admin, reseller or user.
+
+    Deliberately carries no balances: credits change on every purchase and are
+    always read from the database.
+    """
+    __slots__ = ("kind", "id", "username", "is_active", "loaded_at")
+
+    def __init__(self, kind: str, id: int, username: str, is_active: bool):
+        self.kind = kind
+        self.id = id
+        self.username = username
+        self.is_active = is_active
+        self.loaded_at = time.monotonic()
+
+
+class PrincipalCache:
+    def __init__(self, ttl: float = PRINCIPAL_CACHE_TTL, max_size: int = PRINCIPAL_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.entries: "OrderedDict[tuple, Principal]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, db: Session, model, kind: str, principal_id: int, active_column=None) -> Optional[Principal]:
+        """Return the cached snapshot, loading it from `model` when missing or older than the TTL.
+
+        `active_column` overrides `model.is_active` for models that track
+        access differently (users: not banned).
+        """
+        key = (kind, principal_id)
+        with self.lock:
+            principal = self.entries.get(key)
+            if principal is not None and time.monotonic() - principal.loaded_at < self.ttl:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return principal
+            self.misses += 1
+
+        active = model.is_active if active_column is None else active_column
+        row = db.query(model.id, model.username, active).filter(model.id == principal_id).first()
+        if row is None:
+            self.invalidate(kind, principal_id)
+            return None
+        principal = Principal(kind, row[0], row[1], bool(row[2]))
+        with self.lock:
+            self.entries[key] = principal
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        return principal
+
+    def prime(self, db: Session, model, kind: str) -> int:
+        """Load active principals in one query so the first requests after boot are hits"""
+        rows = db.query(model.id, model.username, model.is_active).filter(
+            model.is_active == True
+        ).limit(self.max_size).all()
+        with self.lock:
+            for row in rows:
+                self.entries[(kind, row.id)] = Principal(kind, row.id, row.username, True)
+        return len(rows)
+
+    def invalidate(self, kind: str, principal_id: int):
+        with self.lock:
+            if self.entries.pop((kind, principal_id), None) is not None:
+                self.invalidations += 1
+
+    def invalidate_kind(self, kind: str):
+        """Drop every snapshot of one kind, e.g. all users after their app was deleted"""
+        with self.lock:
+            keys = [key for key in self.entries if key[0] == kind]
+            for key in keys:
+                del self.entries[key]
+            self.invalidations += len(keys)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+principal_cache = PrincipalCache()
@@ -0,0 +1,146 @@
+import asyncio
+import os
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional
+from database import SessionLocal
+from controllers.deletion_controller import (
+    app_deletion_steps, user_deletion_steps, count_deletion_rows, revoke_app_secret, delete_in_chunks
+)
+from utils.presence import presence
+from security.principal_cache import principal_cache
+
+# Rows deleted per statement/transaction
+DELETION_CHUNK = int(os.getenv("DELETION_CHUNK", "5000"))
+# How long a DELETE request waits for its job before answering 202 with the job id
+DELETION_INLINE_SECONDS = float(os.getenv("DELETION_INLINE_SECONDS", "2"))
+# Finished jobs kept for the progress endpoints
+DELETION_JOBS_KEPT = int(os.getenv("DELETION_JOBS_KEPT", "100"))
+
+
+class DeletionJob:
+    def __init__(self, kind: str, target_id: int, admin_id: int):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.target_id = target_id
+        self.admin_id = admin_id
+        self.status = "pending"
+        self.totals: Dict[str, int] = {}
+        self.deleted: Dict[str, int] = {}
+        self.files_removed = 0
+        self.error: Optional[str] = None
+        self.created_at = datetime.utcnow()
+        self.finished_at: Optional[datetime] = None
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("completed", "failed")
+
+    def as_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "target_id": self.target_id,
+            "status": self.status,
+            "progress": {
+                table: {"deleted": self.deleted.get(table, 0), "total": total}
+                for table, total in self.totals.items()
+            },
+            "files_removed": self.files_removed,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class DeletionJobs:
+    """Background purges of apps and users with large histories.
+
+    Children are removed in primary-key chunks on a worker thread with its
+    own session, so neither the request nor the event loop ever holds the
+    whole history, and each chunk commits on its own. Uploaded files are
+    unlinked once their rows are gone. A job that fails can be started
+    again with the same DELETE request and continues where it stopped.
+    """
+
+    def __init__(self, chunk_size: int = DELETION_CHUNK):
+        self.chunk_size = chunk_size
+        self.jobs: "OrderedDict[str, DeletionJob]" = OrderedDict()
+
+    def _purge(self, job: DeletionJob):
+        db = SessionLocal()
+        try:
+            if job.kind == "app":
+                steps = app_deletion_steps(job.target_id)
+                revoke_app_secret(db, job.target_id)
+            else:
+                steps = user_deletion_steps(job.target_id)
+            job.totals = count_deletion_rows(db, steps)
+            for model, condition in steps:
+                table = model.__tablename__
+                for deleted, paths in delete_in_chunks(db, model, condition, self.chunk_size):
+                    job.deleted[table] = job.deleted.get(table, 0) + deleted
+                    for path in paths:
+                        try:
+                            os.remove(path)
+                            job.files_removed += 1
+                        except FileNotFoundError:
+                            pass
+                        except OSError as e:
+                            print(f"Failed to remove {path}: {e}")
+        finally:
+            db.close()
+
+    async def _run(self, job: DeletionJob, app_id: int):
+        job.status = "running"
+        try:
+            await asyncio.to_thread(self._purge, job)
+            job.status = "completed"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            print(f"Deletion of {job.kind} {job.target_id} failed: {e}")
+        finally:
+            job.finished_at = datetime.utcnow()
+        if job.status == "completed":
+            if job.kind == "app":
+                presence.drop_app(app_id)
+                principal_cache.invalidate_kind("user")
+            else:
+                presence.remove(app_id, job.target_id)
+                principal_cache.invalidate("user", job.target_id)
+
+    def submit(self, kind: str, target_id: int, app_id: int, admin_id: int) -> DeletionJob:
+        """Start purging `kind` ("app" or "user") `target_id`; returns the running job if there already is one"""
+        for job in self.jobs.values():
+            if job.kind == kind and job.target_id == target_id and not job.done:
+                return job
+        job = DeletionJob(kind, target_id, admin_id)
+        self.jobs[job.id] = job
+        while len(self.jobs) > DELETION_JOBS_KEPT:
+            oldest = next(iter(self.jobs.values()))
+            if not oldest.done:
+                break
+            self.jobs.popitem(last=False)
+        job.task = asyncio.create_task(self._run(job, app_id))
+        return job
+
+    async def wait(self, job: DeletionJob, timeout: float = DELETION_INLINE_SECONDS) -> bool:
+        """Wait up to `timeout` seconds; True once the job has finished"""
+        try:
+            await asyncio.wait_for(asyncio.shield(job.task), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return job.done
+
+    def get(self, job_id: str, admin_id: int) -> Optional[DeletionJob]:
+        job = self.jobs.get(job_id)
+        return job if job and job.admin_id == admin_id else None
+
+    def list(self, admin_id: int) -> list:
+        return [job.as_dict() for job in reversed(self.jobs.values()) if job.admin_id == admin_id]
+
+
+deletion_jobs = DeletionJobs()
@@ -0,0 +1,109 @@
+import asyncio
+import os
+from datetime import datetime
+from typing import Optional
+from database import SessionLocal
+from models.app import App
+from controllers.expiry_controller import expire_licenses, expired_subscriptions, claim_sweep_window
+from utils.webhook import send_webhook
+
+# Seconds between sweeps
+EXPIRY_SWEEP_INTERVAL_SECONDS = float(os.getenv("EXPIRY_SWEEP_INTERVAL_SECONDS", "60"))
+# Licenses deactivated per transaction
+EXPIRY_SWEEP_BATCH = int(os.getenv("EXPIRY_SWEEP_BATCH", "1000"))
+# Keys/users listed in one webhook; the count always covers all of them
+EXPIRY_WEBHOOK_ITEM_LIMIT = int(os.getenv("EXPIRY_WEBHOOK_ITEM_LIMIT", "1000"))
+
+SUBSCRIPTION_WATERMARK = "subscription_expiry"
+
+
+class ExpirySweeper:
+    """Periodically deactivates expired licenses and announces expiries per app.
+
+    After a sweep `License.is_active` can be trusted on its own. Subscriptions
+    have no active flag; users whose expiry_timestamp passed since the previous
+    sweep are announced with one subscription_expired webhook per app. That
+    window is claimed through a watermark stored in the database, so each one
+    is announced by exactly one worker, including expiries during downtime.
+    """
+
+    def __init__(self, interval: float = EXPIRY_SWEEP_INTERVAL_SECONDS, batch_size: int = EXPIRY_SWEEP_BATCH):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.licenses_expired = 0
+        self.subscriptions_expired = 0
+        self.last_run_seconds = 0.0
+
+    def _sweep(self, now: datetime):
+        db = SessionLocal()
+        try:
+            licenses = expire_licenses(db, now, self.batch_size)
+            window = claim_sweep_window(db, SUBSCRIPTION_WATERMARK, now)
+            subscriptions = expired_subscriptions(db, *window) if window else {}
+            app_ids = set(licenses) | set(subscriptions)
+            webhooks = dict(
+                db.query(App.id, App.webhook_url).filter(App.id.in_(app_ids), App.webhook_url.isnot(None)).all()
+            ) if app_ids else {}
+            return licenses, subscriptions, webhooks
+        finally:
+            db.close()
+
+    async def run_once(self) -> dict:
+        now = datetime.utcnow()
+        started = asyncio.get_running_loop().time()
+        # Sync database work goes to a thread so large batches never stall the event loop
+        licenses, subscriptions, webhooks = await asyncio.to_thread(self._sweep, now)
+        self.runs += 1
+        self.last_run_seconds = asyncio.get_running_loop().time() - started
+        self.licenses_expired += sum(len(keys) for keys in licenses.values())
+        self.subscriptions_expired += sum(len(users) for users in subscriptions.values())
+
+        limit = EXPIRY_WEBHOOK_ITEM_LIMIT
+        for app_id, keys in licenses.items():
+            if app_id in webhooks:
+                asyncio.create_task(send_webhook(webhooks[app_id], "license_expired", {
+                    "count": len(keys),
+                    "license_keys": keys[:limit],
+                    "truncated": len(keys) > limit,
+                    "expired_before": now.isoformat()
+                }))
+        for app_id, users in subscriptions.items():
+            if app_id in webhooks:
+                asyncio.create_task(send_webhook(webhooks[app_id], "subscription_expired", {
+                    "count": len(users),
+                    "users": [{"user_id": user_id, "username": username} for user_id, username in users[:limit]],
+                    "truncated": len(users) > limit,
+                    "expired_before": now.isoformat()
+                }))
+        return {
+            "licenses": {app_id: len(keys) for app_id, keys in licenses.items()},
+            "subscriptions": {app_id: len(users) for app_id, users in subscriptions.items()},
+        }
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                print(f"Expiry sweep failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self.task:
+            self.task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "runs": self.runs,
+            "licenses_expired": self.licenses_expired,
+            "subscriptions_expired": self.subscriptions_expired,
+            "last_run_seconds": round(self.last_run_seconds, 3),
+        }
+
+
+expiry_sweeper = ExpirySweeper()
@@ -1,5 +1,6 @@
 from sqlalchemy.orm import Session
 from models.log import Log
+from controllers.analytics_controller import record_log_event
 from datetime import datetime
 
 
@@ -10,7 +11,8 @@ def create_log(
     ip_address: str = None,
     user_agent: str = None,
     details: str = None,
-    user_id: int = None
+    user_id: int = None,
+    username: str = None
 ):
     log = Log(
         app_id=app_id,
@@ -21,6 +23,8 @@ def create_log(
         user_id=user_id
     )
     db.add(log)
+    # Analytics rollups are updated in the same transaction as the log row
+    record_log_event(db, app_id, action, ip_address=ip_address, username=username)
     db.commit()
     return log
 
@@ -0,0 +1,181 @@
+import asyncio
+import contextvars
+import os
+import sys
+import threading
+import time
+import weakref
+from collections import Counter
+from typing import Dict, Optional
+from utils.metrics import current_request, loop_blocked, loop_lag
+from utils.profiler import BACKEND_DIR, collapse_stack, frame_label
+
+# How often the loop is asked to wake up; the lag is how late it does
+LOOP_LAG_INTERVAL_MS = float(os.getenv("LOOP_LAG_INTERVAL_MS", "25"))
+# A loop that has not woken up for this long counts as blocked and gets sampled
+LOOP_LAG_THRESHOLD_MS = float(os.getenv("LOOP_LAG_THRESHOLD_MS", "100"))
+# Stack sampling interval of the watchdog thread while the loop is blocked
+LOOP_LAG_SAMPLE_MS = float(os.getenv("LOOP_LAG_SAMPLE_MS", "10"))
+
+
+def blocking_frames(frame):
+    """(innermost first-party frame, innermost frame) of a sampled stack"""
+    leaf = frame_label(frame)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(BACKEND_DIR) and "site-packages" not in filename:
+            return frame_label(frame), leaf
+        frame = frame.f_back
+    return leaf, leaf
+
+
+class RouteLag:
+    __slots__ = ("blocks", "samples", "max_ms", "frames", "stacks")
+
+    def __init__(self):
+        self.blocks = 0
+        self.samples = 0
+        self.max_ms = 0.0
+        self.frames: Counter = Counter()
+        self.stacks: Counter = Counter()
+
+
+class LoopMonitor:
+    """Detects event loop stalls and attributes them to the request being served.
+
+    A ticker task records when the loop last woke up. A watchdog thread
+    samples the loop thread's stack whenever that is more than the threshold
+    ago, so the blocking frame is caught while it is still running. The
+    request is found through a task factory that remembers each task's
+    context, where MetricsMiddleware has set current_request.
+    """
+
+    def __init__(self, interval_ms: float = LOOP_LAG_INTERVAL_MS, threshold_ms: float = LOOP_LAG_THRESHOLD_MS,
+                 sample_ms: float = LOOP_LAG_SAMPLE_MS):
+        self.interval = interval_ms / 1000
+        self.threshold = threshold_ms / 1000
+        self.sample_interval = sample_ms / 1000
+        self.routes: Dict[str, RouteLag] = {}
+        self.lock = threading.Lock()
+        self.contexts: "weakref.WeakKeyDictionary[asyncio.Task, contextvars.Context]" = weakref.WeakKeyDictionary()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.loop_thread_id = 0
+        self.heartbeat = 0.0
+        self.max_lag_ms = 0.0
+        self.ticker: Optional[asyncio.Task] = None
+        self.watchdog: Optional[threading.Thread] = None
+        self.stopped = threading.Event()
+
+    def _task_factory(self, loop, coro, context=None):
+        if context is None:
+            context = contextvars.copy_context()
+        task = asyncio.Task(coro, loop=loop, context=context)
+        self.contexts[task] = context
+        return task
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread_id = threading.get_ident()
+        if self.loop.get_task_factory() is None:
+            self.loop.set_task_factory(self._task_factory)
+        self.heartbeat = time.monotonic()
+        self.stopped.clear()
+        self.ticker = asyncio.create_task(self._tick())
+        self.watchdog = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        self.watchdog.start()
+
+    async def stop(self):
+        self.stopped.set()
+        if self.ticker:
+            self.ticker.cancel()
+        if self.loop and self.loop.get_task_factory() == self._task_factory:
+            self.loop.set_task_factory(None)
+        if self.watchdog:
+            self.watchdog.join()
+
+    async def _tick(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            loop_lag.observe(lag)
+            self.max_lag_ms = max(self.max_lag_ms, lag * 1000)
+            self.heartbeat = now
+
+    def _current_route(self) -> str:
+        task = asyncio.current_task(self.loop)
+        context = self.contexts.get(task) if task is not None else None
+        request = context.get(current_request) if context is not None else None
+        return request.route if request is not None else "outside request"
+
+    def _watch(self):
+        blocked_heartbeat = None
+        while not self.stopped.wait(self.sample_interval):
+            heartbeat = self.heartbeat
+            stalled = time.monotonic() - heartbeat - self.interval
+            if stalled < self.threshold:
+                continue
+            frame = sys._current_frames().get(self.loop_thread_id)
+            if frame is None:
+                continue
+            route = self._current_route()
+            frame_text, leaf = blocking_frames(frame)
+            stack = collapse_stack(frame)
+            del frame
+            with self.lock:
+                entry = self.routes.get(route)
+                if entry is None:
+                    entry = self.routes[route] = RouteLag()
+                if heartbeat != blocked_heartbeat:
+                    entry.blocks += 1
+                    blocked_heartbeat = heartbeat
+                entry.samples += 1
+                entry.max_ms = max(entry.max_ms, stalled * 1000)
+                entry.frames[(frame_text, leaf)] += 1
+                entry.stacks[stack] += 1
+            loop_blocked.inc(route, amount=self.sample_interval)
+
+    def report(self, limit: int = 20, frames: int = 5) -> list:
+        with self.lock:
+            rows = [
+                {
+                    "route": route,
+                    "blocks": entry.blocks,
+                    "blocked_ms": round(entry.samples * self.sample_interval * 1000, 1),
+                    "max_block_ms": round(entry.max_ms, 1),
+                    "frames": [
+                        {"frame": frame, "leaf": leaf, "samples": count}
+                        for (frame, leaf), count in entry.frames.most_common(frames)
+                    ],
+                }
+                for route, entry in self.routes.items()
+            ]
+        return sorted(rows, key=lambda row: -row["blocked_ms"])[:limit]
+
+    def collapsed(self) -> str:
+        """Blocked-loop stacks of every route, prefixed with the route, in collapsed-stack format"""
+        with self.lock:
+            return "".join(
+                f"{route};{stack} {count}\n"
+                for route, entry in self.routes.items()
+                for stack, count in entry.stacks.items()
+            )
+
+    def clear(self):
+        with self.lock:
+            self.routes.clear()
+            self.max_lag_ms = 0.0
+
+    def stats(self) -> dict:
+        with self.lock:
+            blocks = sum(entry.blocks for entry in self.routes.values())
+        return {
+            "running": self.watchdog is not None and self.watchdog.is_alive(),
+            "threshold_ms": self.threshold * 1000,
+            "max_lag_ms": round(self.max_lag_ms, 2),
+            "blocks": blocks,
+        }
+
+
+loop_monitor = LoopMonitor()
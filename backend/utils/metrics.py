@@ -0,0 +1,210 @@
+import bisect
+import math
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Bearer token required by GET /metrics; leave empty to serve it unauthenticated
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+STATEMENT_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+BCRYPT_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.values: Dict[tuple, float] = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        with self.lock:
+            items = list(self.values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}" for labels, value in items]
+
+
+class Histogram:
+    """Fixed-bucket histogram; an observation is one bisect and one locked increment"""
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: a count per bucket, one for +Inf, then the running sum
+        self.values: Dict[tuple, list] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.values.get(labels)
+            if series is None:
+                series = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        with self.lock:
+            items = [(labels, list(series)) for labels, series in self.values.items()]
+        names = self.labelnames + ("le",)
+        lines = []
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), series[:-1]):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(names, labels + (_format_value(bound),))} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors: List[Tuple[str, Callable[[], dict]]] = []
+
+    def counter(self, name: str, help: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, help, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, prefix: str, collect: Callable[[], dict]):
+        """Register a stats function read at scrape time; its numeric values are exported as gauges"""
+        self.collectors.append((prefix, collect))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        for prefix, collect in self.collectors:
+            try:
+                stats = collect()
+            except Exception as e:
+                print(f"Metrics collector {prefix} failed: {e}")
+                continue
+            for key, value in stats.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                lines.append(f"# TYPE {prefix}_{key} gauge")
+                lines.append(f"{prefix}_{key} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.counter(
+    "http_requests_total", "HTTP responses by route template and status", ("method", "route", "status")
+)
+http_latency = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route")
+)
+http_statements = registry.histogram(
+    "http_request_db_statements", "SQL statements executed per HTTP request", ("route",), STATEMENT_COUNT_BUCKETS
+)
+db_statement_latency = registry.histogram(
+    "db_statement_duration_seconds", "SQL statement execution time by route template", ("route",), SQL_BUCKETS
+)
+password_latency = registry.histogram(
+    "password_hash_duration_seconds", "bcrypt hash/verify time", ("operation",), BCRYPT_BUCKETS
+)
+webhook_sends = registry.counter("webhook_sends_total", "Webhook deliveries by event and outcome", ("event", "outcome"))
+rate_limit_rejections = registry.counter("rate_limit_rejections_total", "Requests refused by the per-IP rate limit")
+loop_lag = registry.histogram("event_loop_lag_seconds", "How late the event loop ran a timer", (), LAG_BUCKETS)
+loop_blocked = registry.counter(
+    "event_loop_blocked_seconds_total", "Time the event loop was blocked, by the route it was serving", ("route",)
+)
+
+
+class RequestMetrics:
+    """Per-request state shared with the engine hooks through a context variable"""
+    __slots__ = ("scope", "statements", "queries")
+
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self.statements = 0
+        self.queries: Optional[list] = None  # (sql, ms) pairs, only collected while profiling
+
+    @property
+    def route(self) -> str:
+        # Read lazily: the router fills the scope in after the middleware has started.
+        # Newer FastAPI keeps included routes unprefixed and records the full path
+        # on the effective route context instead
+        effective = self.scope.get("fastapi", {}).get("effective_route_context")
+        route = self.scope.get("route")
+        return getattr(effective, "path", None) or getattr(route, "path", None) or "unmatched"
+
+
+current_request: ContextVar[Optional[RequestMetrics]] = ContextVar("current_request", default=None)
+
+
+def instrument_engine(engine: Engine):
+    """Time every statement and attribute it to the route being served (or "background")"""
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_started = time.perf_counter()
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_metrics_started", None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        request = current_request.get()
+        if request is not None:
+            request.statements += 1
+            if request.queries is not None:
+                request.queries.append((statement, elapsed * 1000))
+        db_statement_latency.observe(elapsed, request.route if request else "background")
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+
+    def pool_gauges() -> dict:
+        pool = engine.pool
+        return {
+            name: getattr(pool, name)()
+            for name in ("size", "checkedin", "checkedout", "overflow")
+            if hasattr(pool, name)
+        }
+
+    registry.add_collector("db_pool", pool_gauges)
@@ -0,0 +1,180 @@
+import asyncio
+import math
+import os
+import time
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+# A session counts as online for this long after its last heartbeat
+PRESENCE_TTL_SECONDS = float(os.getenv("PRESENCE_TTL_SECONDS", "90"))
+# Width of one timer wheel slot; stale sessions are removed at most this late
+PRESENCE_WHEEL_SLOT_SECONDS = float(os.getenv("PRESENCE_WHEEL_SLOT_SECONDS", "5"))
+# Expired entries handled before the sweeper yields back to the event loop
+PRESENCE_SWEEP_CHUNK = 5000
+
+USER_BITS = 32
+USER_MASK = (1 << USER_BITS) - 1
+
+
+class AppPresence:
+    """Online sessions of one app as dense parallel arrays.
+
+    user_ids[i] was last seen at last_seen[i]; index maps a user id to i.
+    Removal swaps the last element into the hole, so add, touch and remove
+    are O(1) and a page is a slice. Only ints and floats are stored, so
+    none of it is tracked by the garbage collector.
+    """
+    __slots__ = ("index", "user_ids", "last_seen")
+
+    def __init__(self):
+        self.index: Dict[int, int] = {}
+        self.user_ids = array("q")
+        self.last_seen = array("d")
+
+    def touch(self, user_id: int, now: float) -> Optional[float]:
+        """Record a heartbeat; returns the previous one, or None for a new session"""
+        position = self.index.get(user_id)
+        if position is None:
+            self.index[user_id] = len(self.user_ids)
+            self.user_ids.append(user_id)
+            self.last_seen.append(now)
+            return None
+        previous = self.last_seen[position]
+        self.last_seen[position] = now
+        return previous
+
+    def remove(self, user_id: int) -> bool:
+        position = self.index.pop(user_id, None)
+        if position is None:
+            return False
+        last = len(self.user_ids) - 1
+        if position != last:
+            moved = self.user_ids[last]
+            self.user_ids[position] = moved
+            self.last_seen[position] = self.last_seen[last]
+            self.index[moved] = position
+        self.user_ids.pop()
+        self.last_seen.pop()
+        return True
+
+    def page(self, offset: int, limit: int) -> List[Tuple[int, float]]:
+        return list(zip(self.user_ids[offset:offset + limit], self.last_seen[offset:offset + limit]))
+
+
+class PresenceTable:
+    """In-memory online sessions keyed by (app_id, user_id), expired by a timer wheel.
+
+    Every heartbeat schedules the session into the wheel slot where it
+    would expire (at most once per slot). The sweeper empties due slots and
+    drops the sessions that have not been seen since. Entries for sessions
+    that sent a later heartbeat into another slot are skipped, because that
+    heartbeat already scheduled them. A sweeper running late can reach a
+    slot that already holds entries for the next revolution; those are put
+    back rather than dropped. All access happens on the event loop, so
+    nothing is locked.
+    """
+
+    def __init__(self, ttl: float = PRESENCE_TTL_SECONDS, slot: float = PRESENCE_WHEEL_SLOT_SECONDS):
+        self.ttl = ttl
+        self.slot = slot
+        self.apps: Dict[int, AppPresence] = {}
+        self.sessions = 0
+        self.slots = int(math.ceil(ttl / slot)) + 2
+        self.wheel = [array("q") for _ in range(self.slots)]
+        self.next_tick = int(time.monotonic() // slot)
+        self.task: Optional[asyncio.Task] = None
+
+    def _expiry_tick(self, seen: float) -> int:
+        return int((seen + self.ttl) // self.slot) + 1
+
+    def heartbeat(self, app_id: int, user_id: int, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        app = self.apps.get(app_id)
+        if app is None:
+            app = self.apps[app_id] = AppPresence()
+        previous = app.touch(user_id, now)
+        if previous is None:
+            self.sessions += 1
+        tick = self._expiry_tick(now)
+        if previous is None or self._expiry_tick(previous) != tick:
+            self.wheel[tick % self.slots].append(app_id << USER_BITS | user_id)
+
+    def remove(self, app_id: int, user_id: int):
+        app = self.apps.get(app_id)
+        if app is not None and app.remove(user_id):
+            self.sessions -= 1
+
+    def drop_app(self, app_id: int):
+        """Forget every session of a deleted app; its wheel entries are skipped when due"""
+        app = self.apps.pop(app_id, None)
+        if app is not None:
+            self.sessions -= len(app.index)
+
+    def count(self, app_id: int) -> int:
+        app = self.apps.get(app_id)
+        return len(app.index) if app else 0
+
+    def page(self, app_id: int, offset: int, limit: int) -> List[Tuple[int, float]]:
+        """(user_id, seconds since last heartbeat) for one page of online sessions, in no particular order"""
+        app = self.apps.get(app_id)
+        if app is None:
+            return []
+        now = time.monotonic()
+        return [(user_id, now - seen) for user_id, seen in app.page(offset, limit)]
+
+    async def sweep(self, now: Optional[float] = None) -> int:
+        now = time.monotonic() if now is None else now
+        current = int(now // self.slot)
+        # After a stall longer than one revolution every slot is due once
+        self.next_tick = max(self.next_tick, current - self.slots + 1)
+        removed = 0
+        while self.next_tick <= current:
+            index = self.next_tick % self.slots
+            due, self.wheel[index] = self.wheel[index], array("q")
+            self.next_tick += 1
+            for offset in range(0, len(due), PRESENCE_SWEEP_CHUNK):
+                for key in due[offset:offset + PRESENCE_SWEEP_CHUNK]:
+                    app_id, user_id = key >> USER_BITS, key & USER_MASK
+                    app = self.apps.get(app_id)
+                    position = app.index.get(user_id) if app else None
+                    if position is None:
+                        continue
+                    seen = app.last_seen[position]
+                    if seen + self.ttl <= now:
+                        app.remove(user_id)
+                        self.sessions -= 1
+                        removed += 1
+                    elif self._expiry_tick(seen) % self.slots == index:
+                        # Its latest heartbeat scheduled it here for a later revolution
+                        self.wheel[index].append(key)
+                await asyncio.sleep(0)
+        for app_id in [app_id for app_id, app in self.apps.items() if not app.index]:
+            del self.apps[app_id]
+        return removed
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.slot)
+            try:
+                await self.sweep()
+            except Exception as e:
+                print(f"Presence sweep failed: {e}")
+
+    def start(self):
+        self.next_tick = int(time.monotonic() // self.slot)
+        self.task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self.task:
+            self.task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "sessions": self.sessions,
+            "apps": len(self.apps),
+            "ttl_seconds": self.ttl,
+            "wheel_entries": sum(len(bucket) for bucket in self.wheel),
+        }
+
+
+presence = PresenceTable()
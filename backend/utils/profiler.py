@@ -0,0 +1,144 @@
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# Fraction of requests profiled without being asked (0 disables sampling)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+# Requests sent by an admin with this header set are always profiled
+PROFILE_HEADER = os.getenv("PROFILE_HEADER", "X-Profile").lower().encode()
+# Stack sampling interval while a request is being profiled
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "1"))
+# Completed profiles kept in memory, oldest dropped first
+PROFILE_BUFFER_SIZE = int(os.getenv("PROFILE_BUFFER_SIZE", "50"))
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    if filename.startswith(BACKEND_DIR):
+        filename = filename[len(BACKEND_DIR) + 1:]
+    elif "site-packages" in filename:
+        filename = filename.split("site-packages" + os.sep, 1)[-1]
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+def collapse_stack(frame) -> str:
+    """Root-first `a;b;c` frame labels, the line format flamegraph.pl and speedscope read"""
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class StackSampler:
+    """Samples one thread's Python stack on a timer and counts identical stacks.
+
+    Statistical rather than deterministic, so the profiled code runs at full
+    speed apart from the sampling thread waking up once per interval.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse_stack(frame)] += 1
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self) -> Counter:
+        self.stopped.set()
+        self.thread.join()
+        return self.stacks
+
+
+class Profile:
+    __slots__ = ("id", "method", "path", "route", "status", "reason", "started_at", "duration_ms", "queries", "stacks")
+
+    def __init__(self, id: int, method: str, path: str, reason: str):
+        self.id = id
+        self.method = method
+        self.path = path
+        self.route = None
+        self.status = None
+        self.reason = reason
+        self.started_at = datetime.utcnow()
+        self.duration_ms = 0.0
+        self.queries: List[tuple] = []
+        self.stacks: Dict[str, int] = {}
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status": self.status,
+            "reason": self.reason,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration_ms, 2),
+            "query_count": len(self.queries),
+            "query_ms": round(sum(ms for _, ms in self.queries), 2),
+            "samples": sum(self.stacks.values()),
+        }
+
+    def detail(self, top: int = 20) -> dict:
+        data = self.summary()
+        data["queries"] = [{"sql": sql, "duration_ms": round(ms, 3)} for sql, ms in self.queries]
+        data["top_stacks"] = [
+            {"samples": count, "stack": stack.split(";")}
+            for stack, count in sorted(self.stacks.items(), key=lambda item: -item[1])[:top]
+        ]
+        return data
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.items())
+
+
+class ProfileStore:
+    """Ring buffer of completed profiles; one request is profiled at a time"""
+
+    def __init__(self, size: int = PROFILE_BUFFER_SIZE):
+        self.profiles: "deque[Profile]" = deque(maxlen=size)
+        self.ids = itertools.count(1)
+        self.active = threading.Lock()
+        self.skipped = 0
+
+    def begin(self, method: str, path: str, reason: str) -> Optional[Profile]:
+        # Concurrent requests share the event loop thread, so two samplers
+        # would see each other's frames; later requests are just not profiled
+        if not self.active.acquire(blocking=False):
+            self.skipped += 1
+            return None
+        return Profile(next(self.ids), method, path, reason)
+
+    def finish(self, profile: Profile):
+        self.profiles.append(profile)
+        self.active.release()
+
+    def list(self) -> List[dict]:
+        return [profile.summary() for profile in reversed(self.profiles)]
+
+    def get(self, profile_id: int) -> Optional[Profile]:
+        for profile in self.profiles:
+            if profile.id == profile_id:
+                return profile
+        return None
+
+
+profile_store = ProfileStore()
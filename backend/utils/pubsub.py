@@ -0,0 +1,161 @@
+import asyncio
+import os
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, Optional
+from urllib.parse import urlparse
+
+# Backend used to share WebSocket events between workers, e.g.
+# redis://localhost:6379/0. Without it events stay inside this process.
+PUBSUB_URL = os.getenv("PUBSUB_URL", "")
+PUBSUB_CHANNEL = os.getenv("PUBSUB_CHANNEL", "skyline:ws")
+
+Handler = Callable[[str], Awaitable[None]]
+
+
+class PubSub(ABC):
+    """Fan a message out to every worker subscribed to the same channel"""
+
+    def __init__(self):
+        self.handler: Optional[Handler] = None
+
+    async def start(self, handler: Handler):
+        self.handler = handler
+
+    async def stop(self):
+        self.handler = None
+
+    @abstractmethod
+    async def publish(self, data: str):
+        """Send `data` to the handler of every subscribed worker, including this one"""
+
+
+class InProcessPubSub(PubSub):
+    """Delivers straight back to this process; used for single workers and tests"""
+
+    async def publish(self, data: str):
+        if self.handler:
+            await self.handler(data)
+
+
+def _encode_command(*args: str) -> bytes:
+    parts = [f"*{len(args)}\r\n".encode()]
+    for arg in args:
+        raw = arg.encode() if isinstance(arg, str) else arg
+        parts.append(f"${len(raw)}\r\n".encode())
+        parts.append(raw)
+        parts.append(b"\r\n")
+    return b"".join(parts)
+
+
+async def _read_reply(reader: asyncio.StreamReader):
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("Connection closed by server")
+    prefix, rest = line[:1], line[1:-2]
+    if prefix == b"+":
+        return rest.decode()
+    if prefix == b"-":
+        raise ConnectionError(rest.decode())
+    if prefix == b":":
+        return int(rest)
+    if prefix == b"$":
+        length = int(rest)
+        if length == -1:
+            return None
+        data = await reader.readexactly(length + 2)
+        return data[:-2]
+    if prefix == b"*":
+        length = int(rest)
+        if length == -1:
+            return None
+        return [await _read_reply(reader) for _ in range(length)]
+    raise ConnectionError(f"Unexpected reply: {line!r}")
+
+
+class RedisPubSub(PubSub):
+    """Minimal Redis-protocol PUBLISH/SUBSCRIBE client built on asyncio streams"""
+
+    def __init__(self, url: str, channel: str = PUBSUB_CHANNEL):
+        super().__init__()
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.ssl = parsed.scheme == "rediss"
+        self.password = parsed.password
+        self.db = (parsed.path or "/0").lstrip("/") or "0"
+        self.channel = channel
+        self._publisher: Optional[tuple] = None
+        self._publish_lock = asyncio.Lock()
+        self._subscriber_task: Optional[asyncio.Task] = None
+
+    async def _open(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port, ssl=self.ssl or None)
+        if self.password:
+            writer.write(_encode_command("AUTH", self.password))
+            await _read_reply(reader)
+        if self.db != "0":
+            writer.write(_encode_command("SELECT", self.db))
+            await _read_reply(reader)
+        return reader, writer
+
+    async def start(self, handler: Handler):
+        await super().start(handler)
+        self._subscriber_task = asyncio.create_task(self._subscribe_loop())
+
+    async def stop(self):
+        await super().stop()
+        if self._subscriber_task:
+            self._subscriber_task.cancel()
+            self._subscriber_task = None
+        if self._publisher:
+            self._publisher[1].close()
+            self._publisher = None
+
+    async def publish(self, data: str):
+        async with self._publish_lock:
+            for attempt in range(2):
+                try:
+                    if self._publisher is None:
+                        self._publisher = await self._open()
+                    reader, writer = self._publisher
+                    writer.write(_encode_command("PUBLISH", self.channel, data))
+                    await writer.drain()
+                    await _read_reply(reader)
+                    return
+                except (ConnectionError, OSError, asyncio.IncompleteReadError) as e:
+                    if self._publisher:
+                        self._publisher[1].close()
+                    self._publisher = None
+                    if attempt:
+                        print(f"PubSub publish failed: {e}")
+
+    async def _subscribe_loop(self):
+        delay = 0.5
+        while True:
+            writer = None
+            try:
+                reader, writer = await self._open()
+                writer.write(_encode_command("SUBSCRIBE", self.channel))
+                await writer.drain()
+                delay = 0.5
+                while True:
+                    reply = await _read_reply(reader)
+                    if isinstance(reply, list) and len(reply) == 3 and reply[0] == b"message":
+                        if self.handler:
+                            await self.handler(reply[2].decode())
+            except asyncio.CancelledError:
+                if writer:
+                    writer.close()
+                raise
+            except Exception as e:
+                print(f"PubSub subscriber disconnected: {e}")
+                if writer:
+                    writer.close()
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+
+
+def create_pubsub(url: str = PUBSUB_URL) -> PubSub:
+    if url.startswith(("redis://", "rediss://")):
+        return RedisPubSub(url)
+    return InProcessPubSub()
@@ -0,0 +1,49 @@
+from contextlib import contextmanager
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from typing import List
+
+
+class QueryCounter:
+    """Record every SQL statement an engine executes while the counter is active.
+
+    Usage:
+        with QueryCounter(engine) as counter:
+            client.get("/api/reseller/licenses", headers=headers)
+        print(counter.count, counter.statements)
+    """
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self.statements: List[str] = []
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._before_cursor_execute)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        event.remove(self.engine, "before_cursor_execute", self._before_cursor_execute)
+        return False
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def assert_max_queries(engine: Engine, budget: int, label: str = ""):
+    """Fail if the wrapped block runs more than `budget` statements (catches N+1 regressions)"""
+    with QueryCounter(engine) as counter:
+        yield counter
+    if counter.count > budget:
+        listing = "\n".join(f"  {i + 1}. {sql.strip()}" for i, sql in enumerate(counter.statements))
+        raise QueryBudgetExceeded(
+            f"{label or 'block'} ran {counter.count} queries, budget is {budget}:\n{listing}"
+        )
@@ -0,0 +1,74 @@
+import hashlib
+import os
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, delete, insert, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+from database import Base
+import models  # noqa: F401 - registers every model on Base.metadata
+from controllers.ticket_search_controller import ensure_ticket_search_index, set_search_backend
+
+# Skip create_all and the search-index DDL when the database already carries
+# the marker for the current schema. Set FAST_BOOT=0 to always run them.
+FAST_BOOT = os.getenv("FAST_BOOT", "1") != "0"
+
+# Kept off Base.metadata so the marker is not part of its own fingerprint
+marker_metadata = MetaData()
+schema_version = Table(
+    "schema_version",
+    marker_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("version", String(64), nullable=False),
+    Column("search_backend", String(20)),
+    Column("applied_at", DateTime),
+)
+
+
+def schema_fingerprint() -> str:
+    """Hash of every table, column, index and constraint the models declare"""
+    digest = hashlib.sha256()
+    for table in Base.metadata.sorted_tables:
+        digest.update(f"table:{table.name}".encode())
+        for column in table.columns:
+            digest.update(f"|{column.name}:{column.type}:{column.nullable}:{column.primary_key}".encode())
+        for index in sorted(table.indexes, key=lambda i: i.name or ""):
+            columns = ",".join(c.name for c in index.columns)
+            digest.update(f"|index:{index.name}:{columns}:{index.unique}".encode())
+        for constraint in sorted(table.constraints, key=lambda c: c.name or ""):
+            digest.update(f"|{type(constraint).__name__}:{constraint.name}".encode())
+    return digest.hexdigest()[:32]
+
+
+def ensure_schema(engine: Engine, fast_boot: bool = FAST_BOOT) -> bool:
+    """Create missing tables and search indexes unless the marker says they are current.
+
+    Returns True when the full schema pass ran, False when fast boot skipped it.
+    """
+    version = schema_fingerprint()
+    if fast_boot:
+        try:
+            with engine.connect() as conn:
+                row = conn.execute(
+                    select(schema_version.c.version, schema_version.c.search_backend)
+                    .where(schema_version.c.id == 1)
+                ).first()
+        except SQLAlchemyError:
+            row = None  # No marker table yet
+        if row and row.version == version:
+            set_search_backend(row.search_backend)
+            return False
+
+    Base.metadata.create_all(bind=engine)
+    # create_all skips tables that already exist, so add indexes declared since
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
+    backend = ensure_ticket_search_index(engine)
+    marker_metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(delete(schema_version))
+        conn.execute(insert(schema_version).values(
+            id=1, version=version, search_backend=backend, applied_at=datetime.utcnow()
+        ))
+    return True
@@ -0,0 +1,193 @@
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from utils.metrics import current_request
+
+# Statements slower than this are recorded
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+# Distinct statement fingerprints kept; the least recently seen are dropped first
+SLOW_QUERY_MAX_ENTRIES = int(os.getenv("SLOW_QUERY_MAX_ENTRIES", "500"))
+
+EXPLAIN_PREFIXES = {"sqlite": "EXPLAIN QUERY PLAN ", "postgresql": "EXPLAIN ", "mysql": "EXPLAIN "}
+EXPLAINABLE = ("select", "with", "update", "delete")
+EXPLAIN_SAVEPOINT = "slow_query_explain"
+CALLER_DIRS = ("routes" + os.sep, "controllers" + os.sep)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*(?:\?|%s|:\w+|\$\d+)(?:\s*,\s*(?:\?|%s|:\w+|\$\d+))*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint(statement: str) -> str:
+    """Statement text with literals and IN-list lengths normalised away"""
+    text = _STRING.sub("?", statement)
+    text = _NUMBER.sub("?", text)
+    text = _PLACEHOLDER_LIST.sub("(?...)", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def _redact_value(value) -> str:
+    if value is None:
+        return "NULL"
+    if isinstance(value, (str, bytes)):
+        return f"<{type(value).__name__}:{len(value)}>"
+    return f"<{type(value).__name__}>"
+
+
+def redact(parameters):
+    """Parameter types and lengths only; values may be secrets, hashes or license keys"""
+    if isinstance(parameters, dict):
+        return {key: _redact_value(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [_redact_value(value) for value in parameters]
+    return _redact_value(parameters)
+
+
+def calling_code() -> Optional[str]:
+    """Innermost frame in routes/ or controllers/ that issued the statement"""
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        for directory in CALLER_DIRS:
+            index = filename.rfind(os.sep + directory)
+            if index != -1:
+                return f"{filename[index + 1:]}:{frame.f_lineno} {frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+class SlowQuery:
+    __slots__ = ("fingerprint", "sql", "parameters", "plan", "routes", "callers", "count", "total_ms", "max_ms",
+                 "first_seen", "last_seen")
+
+    def __init__(self, fingerprint: str, sql: str, parameters):
+        self.fingerprint = fingerprint
+        self.sql = sql
+        self.parameters = parameters
+        self.plan: Optional[List[str]] = None
+        self.routes: Counter = Counter()
+        self.callers: Counter = Counter()
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.first_seen = self.last_seen = datetime.utcnow()
+
+    def as_dict(self) -> dict:
+        return {
+            "fingerprint": self.fingerprint,
+            "example_sql": self.sql,
+            "example_parameters": self.parameters,
+            "plan": self.plan,
+            "routes": dict(self.routes.most_common(10)),
+            "callers": dict(self.callers.most_common(10)),
+            "count": self.count,
+            "total_ms": round(self.total_ms, 2),
+            "mean_ms": round(self.total_ms / self.count, 2),
+            "max_ms": round(self.max_ms, 2),
+            "first_seen": self.first_seen,
+            "last_seen": self.last_seen,
+        }
+
+
+class SlowQueryLog:
+    def __init__(self, threshold_ms: float = SLOW_QUERY_MS, max_entries: int = SLOW_QUERY_MAX_ENTRIES):
+        self.threshold_ms = threshold_ms
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, SlowQuery]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.recorded = 0
+
+    def install(self, engine: Engine):
+        explain_prefix = EXPLAIN_PREFIXES.get(engine.dialect.name)
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            context._slow_query_started = time.perf_counter()
+
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            started = getattr(context, "_slow_query_started", None)
+            if started is None:
+                return
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if elapsed_ms < self.threshold_ms:
+                return
+            entry = self.record(statement, parameters, elapsed_ms)
+            # Explained once per fingerprint, on the raw DBAPI connection so no events fire
+            if entry.plan is None and explain_prefix and not executemany:
+                entry.plan = self.explain(cursor.connection, explain_prefix, statement, parameters)
+
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", after_cursor_execute)
+
+    def record(self, statement: str, parameters, elapsed_ms: float) -> SlowQuery:
+        key = fingerprint(statement)
+        request = current_request.get()
+        route = request.route if request else "background"
+        caller = calling_code()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                entry = self.entries[key] = SlowQuery(key, statement, redact(parameters))
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+            self.entries.move_to_end(key)
+            entry.count += 1
+            entry.total_ms += elapsed_ms
+            entry.max_ms = max(entry.max_ms, elapsed_ms)
+            entry.last_seen = datetime.utcnow()
+            entry.routes[route] += 1
+            if caller:
+                entry.callers[caller] += 1
+            self.recorded += 1
+        return entry
+
+    @staticmethod
+    def explain(dbapi_connection, prefix: str, statement: str, parameters) -> List[str]:
+        if not statement.lstrip().lower().startswith(EXPLAINABLE):
+            return []
+        cursor = dbapi_connection.cursor()
+        try:
+            # Runs inside the caller's transaction; on Postgres a failed statement would abort
+            # it, so the EXPLAIN gets a savepoint of its own and is rolled back on any error
+            try:
+                cursor.execute(f"SAVEPOINT {EXPLAIN_SAVEPOINT}")
+            except Exception as e:
+                return [f"EXPLAIN skipped: {e}"]
+            try:
+                cursor.execute(prefix + statement, parameters)
+                plan = [" ".join(str(column) for column in row) for row in cursor.fetchall()]
+            except Exception as e:
+                try:
+                    cursor.execute(f"ROLLBACK TO SAVEPOINT {EXPLAIN_SAVEPOINT}")
+                except Exception:
+                    pass
+                plan = [f"EXPLAIN failed: {e}"]
+            try:
+                cursor.execute(f"RELEASE SAVEPOINT {EXPLAIN_SAVEPOINT}")
+            except Exception:
+                pass
+            return plan
+        finally:
+            cursor.close()
+
+    def report(self, sort: str = "total_ms", limit: int = 50) -> List[dict]:
+        with self.lock:
+            rows = [entry.as_dict() for entry in self.entries.values()]
+        return sorted(rows, key=lambda row: -row[sort])[:limit]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> dict:
+        return {"threshold_ms": self.threshold_ms, "fingerprints": len(self.entries), "recorded": self.recorded}
+
+
+slow_query_log = SlowQueryLog()
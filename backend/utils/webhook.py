@@ -1,6 +1,7 @@
 import httpx
 import asyncio
 from typing import Optional, Dict, Any
+from utils.metrics import webhook_sends
 
 
 async def send_webhook(webhook_url: str, event: str, data: Dict[str, Any]):
@@ -11,7 +12,9 @@ async def send_webhook(webhook_url: str, event: str, data: Dict[str, Any]):
                 "data": data,
                 "timestamp": int(__import__("datetime").datetime.utcnow().timestamp())
             }
-            await client.post(webhook_url, json=payload)
+            response = await client.post(webhook_url, json=payload)
+        webhook_sends.inc(event, "delivered" if response.status_code < 400 else "http_error")
+    except httpx.TimeoutException:
+        webhook_sends.inc(event, "timeout")
     except Exception:
-        pass
-
+        webhook_sends.inc(event, "failed")
@@ -46,7 +46,7 @@ export function useWebSocket(url, token, ticketId, options = {}) {
       ws.current.onmessage = (event) => {
         try {
           const data = JSON.parse(event.data)
-          if (data.type !== 'pong') {
+          if (data.type !== 'pong' && data.type !== 'heartbeat') {
             setLastMessage(data)
           }
         } catch (error) {
@@ -89,8 +89,9 @@ export default function Tickets() {
       const response = await api.get('/admin/tickets/', { params })
       setTickets(response.data)
       if (selectedTicket) {
+        // The list only carries summaries; keep the loaded thread of the open ticket
         const updated = response.data.find(t => t.id === selectedTicket.id)
-        if (updated) setSelectedTicket(updated)
+        if (updated) setSelectedTicket(prev => ({ ...prev, ...updated }))
       }
     } catch (error) {
       console.error('Failed to fetch tickets:', error)